@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+OCPP-J Envelope Parsing Benchmark
+---------------------------------
+Micro-benchmark of the mock server's per-message path on meter-heavy
+traffic: the original full json.loads of every frame versus the fast path
+that routes on the envelope read from the raw frame and decodes the payload
+only when a handler needs it.
+
+Both variants run the server's real handle_call(), encode the response and
+make the receive loop's two per-message INFO log calls, at WARNING log level
+(as under load). The full-decode variant also pays the UTF-8 decode
+websockets did before handing over text frames and formats its log lines as
+f-strings, as the receive loop used to; the fast path passes %-style
+arguments, which are never formatted below INFO.
+
+Requirements:
+    pip install websockets
+
+Usage:
+    python benchmark-envelope.py
+    python benchmark-envelope.py --messages 500000 --meter-share 0.95 --sampled-values 20
+"""
+
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+import uuid
+
+from ocpp_runtime import load_tool
+
+
+server = load_tool('mock-ocpp-server.py', 'mock_ocpp_server')
+
+MEASURANDS = [
+    ('Energy.Active.Import.Register', None, 'Wh'),
+    ('Power.Active.Import', None, 'W'),
+    ('Current.Import', 'L1', 'A'),
+    ('Current.Import', 'L2', 'A'),
+    ('Current.Import', 'L3', 'A'),
+    ('Voltage', 'L1-N', 'V'),
+    ('Voltage', 'L2-N', 'V'),
+    ('Voltage', 'L3-N', 'V'),
+    ('SoC', None, 'Percent'),
+    ('Temperature', None, 'Celsius'),
+]
+
+
+def meter_values_frame(sampled_values):
+    """A MeterValues CALL with one meterValue of N sampled values"""
+    samples = []
+    for i in range(sampled_values):
+        measurand, phase, unit = MEASURANDS[i % len(MEASURANDS)]
+        sample = {
+            'value': f"{random.uniform(0, 50000):.2f}",
+            'context': 'Sample.Periodic',
+            'format': 'Raw',
+            'measurand': measurand,
+            'location': 'Outlet',
+            'unit': unit,
+        }
+        if phase:
+            sample['phase'] = phase
+        samples.append(sample)
+    return [2, str(uuid.uuid4()), 'MeterValues', {
+        'connectorId': 1,
+        'transactionId': random.randint(1000, 100000),
+        'meterValue': [{'timestamp': '2026-10-18T10:00:00Z', 'sampledValue': samples}],
+    }]
+
+
+def build_traffic(messages, meter_share, sampled_values):
+    """Raw frames (UTF-8 bytes, as received) with the given MeterValues share"""
+    frames = []
+    for _ in range(messages):
+        roll = random.random()
+        if roll < meter_share:
+            message = meter_values_frame(sampled_values)
+        elif roll < meter_share + (1 - meter_share) / 2:
+            message = [2, str(uuid.uuid4()), 'Heartbeat', {}]
+        else:
+            message = [2, str(uuid.uuid4()), 'StatusNotification',
+                       {'connectorId': 1, 'errorCode': 'NoError', 'status': 'Charging'}]
+        frames.append(json.dumps(message, separators=(',', ':')).encode())
+    return frames
+
+
+def full_decode(frames):
+    """Previous path: decode the text frame and the whole message, then dispatch"""
+    logger = server.logger
+    charge_point_id = 'BENCH'
+    for frame in frames:
+        data = json.loads(frame.decode())
+        action = data[2]
+        logger.info(f"← [{charge_point_id}] {action}")
+        response = server.handle_call(charge_point_id, data[1], action, data[3] if len(data) > 3 else {})
+        json.dumps(response)
+        logger.info(f"→ [{charge_point_id}] Response sent")
+
+
+def fast_path(frames):
+    """Envelope-only parse of the raw frame; the payload is decoded lazily"""
+    logger = server.logger
+    charge_point_id = 'BENCH'
+    for frame in frames:
+        call = server.parse_call(frame)
+        if call is None:
+            data = json.loads(frame)
+            call = data[1], data[2], data[3] if len(data) > 3 else {}
+        msg_id, action, payload = call
+        logger.info("← [%s] %s", charge_point_id, action)
+        response = server.handle_call(charge_point_id, msg_id, action, payload)
+        json.dumps(response)
+        logger.info("→ [%s] Response sent", charge_point_id)
+
+
+def measure(function, frames, repeat):
+    """Best of N runs, in microseconds per message"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(frames)
+        best = min(best, time.perf_counter() - started)
+    return best / len(frames) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark OCPP-J envelope fast-path parsing in the mock server')
+    parser.add_argument('--messages', type=int, default=200000, help='Frames per run')
+    parser.add_argument('--meter-share', type=float, default=0.9, help='Share of MeterValues frames (rest: Heartbeat/StatusNotification)')
+    parser.add_argument('--sampled-values', type=int, default=10, help='sampledValue entries per MeterValues frame')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per variant (best is reported)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the generated traffic')
+    parser.add_argument('--json', metavar='FILE', help='Write the results as JSON')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.getLogger().setLevel(logging.WARNING)
+    frames = build_traffic(args.messages, args.meter_share, args.sampled_values)
+    average_size = sum(len(frame) for frame in frames) / len(frames)
+
+    print("=" * 80)
+    print(" OCPP-J Envelope Parsing Benchmark")
+    print("=" * 80)
+    print(f" {args.messages} frames, {args.meter_share * 100:.0f}% MeterValues with {args.sampled_values} "
+          f"sampled values, {average_size:.0f} B average")
+    print("=" * 80)
+
+    results = {}
+    for name, function in (('full_decode', full_decode), ('fast_path', fast_path)):
+        results[name] = measure(function, frames, args.repeat)
+        print(f" {name:<14}{results[name]:10.2f} us/msg {1e6 / results[name]:14,.0f} msg/s")
+    speedup = results['full_decode'] / results['fast_path']
+    print("-" * 80)
+    print(f" Speedup: {speedup:.2f}x")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'messages': args.messages,
+                'meter_share': args.meter_share,
+                'sampled_values': args.sampled_values,
+                'average_frame_bytes': round(average_size, 1),
+                'us_per_message': {name: round(value, 3) for name, value in results.items()},
+                'speedup': round(speedup, 3),
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+OCPP Tools Benchmark Suite
+--------------------------
+End-to-end benchmark of the Python OCPP tools themselves: starts
+mock-ocpp-server.py and a simulated fleet (ocpp-simulator.py --count) on
+localhost and compares the results with a checked-in baseline, so a
+performance regression in the tools is caught before it distorts load-test
+results.
+
+Measured (median of --runs runs):
+    - Connection ramp time (first connect until every charger has booted)
+    - Messages/s per charger and RTT p50/p99 per OCPP action (after the ramp);
+      messages/s and p99 are reported but not gated - the rate is the load the
+      fleet offers (set by the intervals) and p99 swings too much between
+      identical runs
+    - CPU % per 1k chargers and RSS per charger, for simulator and server
+    - Wire bytes per charger and compression ratio (--compression off|deflate)
+
+Requirements:
+    pip install ocpp websockets
+
+Usage:
+    python benchmark-ocpp.py                          # compare with benchmarks/baseline.json
+    python benchmark-ocpp.py --chargers 1000 --duration 60
+    python benchmark-ocpp.py --update-baseline        # record a new baseline
+    python benchmark-ocpp.py --compression off        # bandwidth vs CPU without deflate
+
+Exit code is 1 when any metric regresses by more than the threshold. A run
+whose scenario differs from the baseline's is reported without comparison.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+from ocpp_runtime import TOOLS_DIR, free_port, wait_for_port
+
+DEFAULT_BASELINE = os.path.join(TOOLS_DIR, 'benchmarks', 'baseline.json')
+
+# Actions whose rate and RTT are tracked (the steady-state traffic mix)
+TRACKED_ACTIONS = ('Heartbeat', 'MeterValues')
+
+# Metrics reported for information only: the message rate is the load the fleet
+# offers (--heartbeat-interval, --meter-interval), not something the tools can
+# speed up, and tail latency on a shared host varies by more than any useful
+# threshold between runs of an unchanged tree
+REPORT_ONLY_PREFIXES = ('rate_per_charger.', 'rtt_p99_ms.')
+
+
+def run_scenario(args, workdir):
+    """Run the server and the fleet once; returns (simulator stats, server stats)"""
+    port = free_port()
+    server_stats_file = os.path.join(workdir, 'server-stats.json')
+    simulator_stats_file = os.path.join(workdir, 'simulator-stats.json')
+
+    server = subprocess.Popen([
+        sys.executable, os.path.join(TOOLS_DIR, 'mock-ocpp-server.py'),
+        '--host', '127.0.0.1',
+        '--port', str(port),
+        '--heartbeat-interval', str(args.heartbeat_interval),
+        '--compression', args.compression,
+        '--log-level', 'WARNING',
+        '--stats-file', server_stats_file,
+    ], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+    try:
+        wait_for_port(port)
+        simulator = subprocess.run([
+            sys.executable, os.path.join(TOOLS_DIR, 'ocpp-simulator.py'),
+            '--url', f'ws://127.0.0.1:{port}/ocpp',
+            '--id', 'BENCH',
+            '--count', str(args.chargers),
+            '--ramp-rate', str(args.ramp_rate),
+            '--autostart',
+            '--meter-interval', str(args.meter_interval),
+            '--duration', str(args.duration),
+            '--compression', args.compression,
+            '--spill-dir', workdir,
+            '--log-level', 'WARNING',
+            '--stats-file', simulator_stats_file,
+        ], capture_output=True, text=True, timeout=args.duration + 120)
+        if simulator.returncode != 0 or not os.path.exists(simulator_stats_file):
+            raise RuntimeError(f"Simulator failed (exit {simulator.returncode}):\n{simulator.stderr[-2000:]}")
+    finally:
+        server.terminate()
+        try:
+            _, server_errors = server.communicate(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server_errors = ''
+
+    if not os.path.exists(server_stats_file):
+        raise RuntimeError(f"Mock server wrote no stats:\n{server_errors[-2000:]}")
+
+    with open(simulator_stats_file, encoding='utf-8') as f:
+        simulator_stats = json.load(f)
+    with open(server_stats_file, encoding='utf-8') as f:
+        server_stats = json.load(f)
+    return simulator_stats, server_stats
+
+
+def process_metrics(stats, wall_seconds, chargers):
+    """CPU % per 1k chargers and RSS KB per charger for one process"""
+    metrics = {}
+    if stats.get('cpu_s') is not None and wall_seconds and chargers:
+        cpu_seconds = stats['cpu_s'] - (stats.get('cpu_start_s') or 0)
+        metrics['cpu_pct_per_1k'] = cpu_seconds / wall_seconds * 100 / (chargers / 1000)
+    if stats.get('rss_peak_kb') is not None and chargers:
+        metrics['rss_kb_per_charger'] = (stats['rss_peak_kb'] - (stats.get('rss_start_kb') or 0)) / chargers
+    return metrics
+
+
+def collect_metrics(simulator_stats, server_stats):
+    """Flatten both stats files into {metric: (value, better)}"""
+    metrics = {}
+    if simulator_stats['ramp_s'] is not None:
+        metrics['ramp_s'] = (simulator_stats['ramp_s'], 'lower')
+
+    for action in TRACKED_ACTIONS:
+        action_stats = simulator_stats['actions'].get(action)
+        if not action_stats or not action_stats['count']:
+            continue
+        if action_stats['rate'] is not None:
+            metrics[f'rate_per_charger.{action}'] = (action_stats['rate'] / simulator_stats['chargers'], 'higher')
+        metrics[f'rtt_p50_ms.{action}'] = (action_stats['p50_ms'], 'lower')
+        metrics[f'rtt_p99_ms.{action}'] = (action_stats['p99_ms'], 'lower')
+
+    failures = sum(action_stats['failures'] for action_stats in simulator_stats['actions'].values())
+    metrics['failures'] = (failures, 'lower')
+
+    bandwidth = simulator_stats.get('bandwidth')
+    if bandwidth and bandwidth['connections']:
+        wire_bytes = bandwidth['bytes_in'] + bandwidth['bytes_out']
+        payload_bytes = bandwidth['payload_in'] + bandwidth['payload_out']
+        metrics['wire_kb_per_charger'] = (wire_bytes / 1024 / simulator_stats['chargers'], 'lower')
+        if payload_bytes:
+            metrics['compression_ratio'] = (wire_bytes / payload_bytes, 'lower')
+
+    for name, value in process_metrics(simulator_stats, simulator_stats['duration_s'],
+                                       simulator_stats['chargers']).items():
+        metrics[f'simulator.{name}'] = (value, 'lower')
+    for name, value in process_metrics(server_stats, server_stats['uptime_s'],
+                                       server_stats['peak_connections']).items():
+        metrics[f'server.{name}'] = (value, 'lower')
+
+    return {name: (round(value, 3), better) for name, (value, better) in metrics.items()}
+
+
+def median_metrics(runs):
+    """Median of every metric over several collect_metrics() results"""
+    metrics = {}
+    for name, (_, better) in runs[0].items():
+        values = [run[name][0] for run in runs if name in run]
+        metrics[name] = (round(statistics.median(values), 3), better)
+    return metrics
+
+
+def compare(metrics, baseline, threshold):
+    """Compare against the baseline; returns (rows, regressions)"""
+    rows = []
+    regressions = []
+    base_metrics = baseline.get('metrics', {}) if baseline else {}
+    for name, (value, better) in metrics.items():
+        base = base_metrics.get(name)
+        if base is None:
+            rows.append((name, None, value, None, 'new'))
+            continue
+        limit = base.get('threshold', threshold)
+        base_value = base['value']
+        change = (value - base_value) / base_value if base_value else (0.0 if value == base_value else float('inf'))
+        worse = change > limit if better == 'lower' else change < -limit
+        if name == 'failures':
+            worse = value > base_value  # Any new failure is a regression
+        if name.startswith(REPORT_ONLY_PREFIXES):
+            rows.append((name, base_value, value, change, 'info'))
+            continue
+        status = 'REGRESSED' if worse else 'ok'
+        if worse:
+            regressions.append(name)
+        rows.append((name, base_value, value, change, status))
+    return rows, regressions
+
+
+def print_report(rows, threshold):
+    print(f"\n{'Metric':<36}{'Baseline':>12}{'Current':>12}{'Change':>10}  Status")
+    print('-' * 80)
+    for name, base_value, value, change, status in rows:
+        base_text = f"{base_value:12.3f}" if base_value is not None else f"{'-':>12}"
+        change_text = f"{change * 100:+9.1f}%" if change is not None and change != float('inf') else f"{'-':>10}"
+        marker = '✗' if status == 'REGRESSED' else ('✓' if status == 'ok' else '•')
+        print(f"{name:<36}{base_text}{value:12.3f}{change_text}  {marker} {status}")
+    print('-' * 80)
+    print(f"Regression threshold: {threshold * 100:.0f}% (per-metric overrides in the baseline); "
+          f"{', '.join(prefix.rstrip('.') for prefix in REPORT_ONLY_PREFIXES)} not gated")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark of the OCPP mock server and simulator')
+    parser.add_argument('--chargers', type=int, default=200, help='Simulated chargers')
+    parser.add_argument('--duration', type=float, default=30.0, help='Simulator run time in seconds')
+    parser.add_argument('--ramp-rate', type=float, default=100.0, help='Chargers connected per second')
+    parser.add_argument('--heartbeat-interval', type=int, default=2, help='Heartbeat interval (s) set by the server')
+    parser.add_argument('--meter-interval', type=float, default=1.0, help='Meter Values interval (s) per charger')
+    parser.add_argument('--compression', choices=['deflate', 'off'], default='deflate',
+                        help='WebSocket compression for both sides')
+    parser.add_argument('--runs', type=int, default=3, help='Scenario runs; every metric is the median over them')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='Allowed relative regression (default: from baseline, else 0.25)')
+    parser.add_argument('--update-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--json', metavar='FILE', help='Write the raw results as JSON')
+    parser.add_argument('--no-fail', action='store_true', help='Exit 0 even if metrics regressed')
+    args = parser.parse_args()
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+
+    scenario = {
+        'chargers': args.chargers,
+        'duration': args.duration,
+        'ramp_rate': args.ramp_rate,
+        'heartbeat_interval': args.heartbeat_interval,
+        'meter_interval': args.meter_interval,
+        'compression': args.compression,
+    }
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    threshold = args.threshold if args.threshold is not None else (baseline or {}).get('threshold', 0.25)
+
+    print("=" * 80)
+    print(" OCPP Tools Benchmark")
+    print("=" * 80)
+    print(" Scenario: " + ", ".join(f"{key}={value}" for key, value in scenario.items()) + f" ({args.runs} runs)")
+    comparable = baseline is not None and baseline.get('scenario') == scenario
+    if baseline and not comparable and not args.update_baseline:
+        print(f" ⚠ Scenario differs from the baseline ({baseline.get('scenario')}) - results are not compared")
+    print("=" * 80)
+
+    runs = []
+    for run in range(1, args.runs + 1):
+        with tempfile.TemporaryDirectory(prefix='ocpp-bench-') as workdir:
+            simulator_stats, server_stats = run_scenario(args, workdir)
+        runs.append({
+            'metrics': collect_metrics(simulator_stats, server_stats),
+            'simulator': simulator_stats,
+            'server': server_stats,
+        })
+        print(f" Run {run}/{args.runs} done")
+
+    metrics = median_metrics([run['metrics'] for run in runs])
+    rows, regressions = compare(metrics, baseline if comparable else None, threshold)
+    print_report(rows, threshold)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'scenario': scenario,
+                'metrics': {name: value for name, (value, _) in metrics.items()},
+                'regressions': regressions,
+                'runs': [{
+                    'metrics': {name: value for name, (value, _) in run['metrics'].items()},
+                    'simulator': run['simulator'],
+                    'server': run['server'],
+                } for run in runs],
+            }, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        base_metrics = (baseline or {}).get('metrics', {})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'scenario': scenario,
+                'runs': args.runs,
+                'threshold': threshold,
+                'python': sys.version.split()[0],
+                'metrics': {
+                    name: {
+                        'value': value,
+                        'better': better,
+                        # Keep hand-tuned per-metric thresholds
+                        **({'threshold': base_metrics[name]['threshold']}
+                           if 'threshold' in base_metrics.get(name, {}) else {}),
+                    }
+                    for name, (value, better) in metrics.items()
+                },
+            }, f, indent=2)
+            f.write('\n')
+        print(f"\n📝 Baseline written to {args.baseline}")
+        return 0
+
+    if not comparable:
+        print("\n• No baseline for this scenario - nothing compared (--update-baseline records one)")
+        return 0
+    if regressions:
+        print(f"\n✗ {len(regressions)} metric(s) regressed: {', '.join(regressions)}")
+        return 0 if args.no_fail else 1
+    print("\n✓ No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+OCPP Stale-Charger Detection Check
+----------------------------------
+Reproduces connection sequences against mock-ocpp-server.py and checks that
+its heartbeat deadlines (--heartbeat-grace) still mark silent chargers stale.
+
+Scenarios:
+    silent      one connection that never sends anything after connecting
+    reconnect   connections A and B for the same charger, A closes, B stays
+                silent - closing the replaced connection A must not stop the
+                tracking of B
+    stale-reconnect
+                A starts a transaction and goes stale, B connects while A is
+                still open (a half-open link) and must recover the charger,
+                then B goes stale and closes - its transaction must not stay
+                flagged after either step
+
+Each scenario runs its own server (heartbeat timeout 2 s) and reads the
+liveness counters from its --stats-file. Every scenario must produce a stale
+event and end without flagged transactions; stale-reconnect also a recovery.
+
+Requirements:
+    pip install websockets
+
+Usage:
+    python check-stale-detection.py
+    python check-stale-detection.py --scenario reconnect --silence 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import websockets
+
+from ocpp_runtime import TOOLS_DIR, free_port, wait_for_port
+
+
+# Heartbeat interval 1 s x grace 2 = 2 s without a message marks a charger stale
+SERVER_OPTIONS = ['--heartbeat-interval', '1', '--heartbeat-grace', '2', '--stale-check-interval', '0.5']
+
+
+async def silent(url, silence):
+    async with websockets.connect(f"{url}/D1", subprotocols=['ocpp1.6']):
+        await asyncio.sleep(silence)
+
+
+async def reconnect(url, silence):
+    first = await websockets.connect(f"{url}/D1", subprotocols=['ocpp1.6'])
+    async with websockets.connect(f"{url}/D1", subprotocols=['ocpp1.6']):
+        await first.close()
+        await asyncio.sleep(silence)
+
+
+async def stale_reconnect(url, silence):
+    async with websockets.connect(f"{url}/D1", subprotocols=['ocpp1.6']) as first:
+        await first.send(json.dumps([2, '1', 'StartTransaction', {
+            'connectorId': 1,
+            'idTag': 'CHECK',
+            'meterStart': 0,
+            'timestamp': '2026-01-01T00:00:00Z',
+        }]))
+        await first.recv()
+        await asyncio.sleep(silence)
+        async with websockets.connect(f"{url}/D1", subprotocols=['ocpp1.6']):
+            await asyncio.sleep(silence)
+
+
+SCENARIOS = {'silent': silent, 'reconnect': reconnect, 'stale-reconnect': stale_reconnect}
+
+# Scenarios in which the stale charger must come back online
+EXPECTED_RECOVERIES = {'stale-reconnect': 1}
+
+
+def run_scenario(name, silence, workdir):
+    """Run one scenario against a fresh server; returns its liveness counters"""
+    port = free_port()
+    stats_file = os.path.join(workdir, f"{name}-stats.json")
+    server = subprocess.Popen([
+        sys.executable, os.path.join(TOOLS_DIR, 'mock-ocpp-server.py'),
+        '--host', '127.0.0.1',
+        '--port', str(port),
+        '--log-level', 'WARNING',
+        '--stats-file', stats_file,
+        *SERVER_OPTIONS,
+    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        asyncio.run(SCENARIOS[name](f"ws://127.0.0.1:{port}/ocpp", silence))
+    finally:
+        server.terminate()
+        server.wait(timeout=15)
+    with open(stats_file, encoding='utf-8') as f:
+        return json.load(f)['liveness']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check stale-charger detection in the mock OCPP server')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                        help='Scenario to run (repeatable; default: all)')
+    parser.add_argument('--silence', type=float, default=5.0,
+                        help='Seconds the charger stays silent (the server timeout is 2 s)')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(" OCPP Stale-Charger Detection Check")
+    print("=" * 70)
+
+    failed = []
+    with tempfile.TemporaryDirectory(prefix='ocpp-stale-') as workdir:
+        for name in args.scenario or sorted(SCENARIOS):
+            counts = run_scenario(name, args.silence, workdir)
+            passed = (counts['stale_events'] >= 1
+                      and counts['recoveries'] >= EXPECTED_RECOVERIES.get(name, 0)
+                      and counts['flagged_transactions'] == 0)
+            print(f" {'✓' if passed else '✗'} {name:<16} stale events {counts['stale_events']}, "
+                  f"recoveries {counts['recoveries']}, flagged transactions {counts['flagged_transactions']}")
+            if not passed:
+                failed.append(name)
+
+    print("=" * 70)
+    if failed:
+        print(f" ✗ Stale detection failed in: {', '.join(failed)}")
+        return 1
+    print(" ✓ Silent chargers were marked stale and no transaction stayed flagged")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
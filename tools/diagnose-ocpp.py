@@ -1,146 +1,338 @@
 """
 Advanced OCPP WebSocket Diagnostic Tool
 Tests different connection parameters and shows detailed error info
+
+Every variant is timed phase by phase (DNS, TCP connect, TLS, HTTP upgrade /
+subprotocol negotiation, first BootNotification response), so a connect
+latency regression can be pinned to the phase that got slower. Variants run
+concurrently, bounded by --concurrency.
+
+Usage:
+    python diagnose-ocpp.py
+    python diagnose-ocpp.py --url wss://csms.example.com:443 --ca-cert ca.pem
+    python diagnose-ocpp.py --repeat 5 --concurrency 8 --json report.json
 """
 
+import argparse
 import asyncio
+import json
+import socket
+import ssl
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
 import websockets
+import websockets.exceptions
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
+from ocpp_runtime import build_ssl_context
+
 logger = logging.getLogger(__name__)
 
-async def test_detailed(url, subprotocols=None, extra_headers=None):
-    """Test with detailed error logging"""
-    print(f"\n{'='*70}")
-    print(f"Testing: {url}")
-    if subprotocols:
-        print(f"Subprotocols: {subprotocols}")
-    if extra_headers:
-        print(f"Headers: {extra_headers}")
-    print('='*70)
-    
+PHASES = ('dns', 'tcp', 'tls', 'upgrade', 'boot')
+
+# websockets >= 14 renamed extra_headers to additional_headers
+HEADERS_KWARG = 'additional_headers' if int(websockets.__version__.split('.')[0]) >= 14 else 'extra_headers'
+
+
+async def test_detailed(test, ssl_context=None, timeout=5.0):
+    """Connect once with one variant, timing every phase.
+
+    Returns a result dict; on failure 'failed_phase' names the phase that broke.
+    """
+    url = test['url']
+    result = {
+        'name': test['name'],
+        'url': url,
+        'subprotocols': test.get('subprotocols'),
+        'headers': test.get('headers'),
+        'ok': False,
+        'phases_ms': {},
+        'failed_phase': None,
+        'error': None,
+        'subprotocol': None,
+        'address': None,
+        'tls': None,
+        'response': None,
+    }
+    phases = result['phases_ms']
+    loop = asyncio.get_running_loop()
+    parsed = urlparse(url)
+    secure = parsed.scheme == 'wss'
+    port = parsed.port or (443 if secure else 80)
+    phase = 'dns'
+    sock = None
+
     try:
-        kwargs = {}
-        if subprotocols:
-            kwargs['subprotocols'] = subprotocols
-        if extra_headers:
-            kwargs['extra_headers'] = extra_headers
-        
-        # Add timeout
-        kwargs['ping_interval'] = None
-        kwargs['close_timeout'] = 5
-        
+        started = time.perf_counter()
+        addresses = await asyncio.wait_for(
+            loop.getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM), timeout
+        )
+        phases['dns'] = (time.perf_counter() - started) * 1000
+
+        # Try every resolved address in turn, like socket.create_connection()
+        # (an IPv6-first answer must not fail against an IPv4-only server)
+        phase = 'tcp'
+        errors = []
+        started = time.perf_counter()
+        for family, sock_type, proto, _, address in addresses:
+            try:
+                sock = socket.socket(family, sock_type, proto)
+                sock.setblocking(False)
+                await asyncio.wait_for(loop.sock_connect(sock, address), timeout)
+                break
+            except (OSError, asyncio.TimeoutError) as e:
+                if sock is not None:
+                    sock.close()
+                    sock = None
+                errors.append(f"{address[0]}: {e or f'timeout after {timeout}s'}")
+        if sock is None:
+            raise OSError(f"No address accepted the connection ({'; '.join(errors)})")
+        phases['tcp'] = (time.perf_counter() - started) * 1000
+        result['address'] = address[0]
+
+        phase = 'tls' if secure else 'upgrade'
+        kwargs = {
+            'sock': sock,
+            'ping_interval': None,
+            'close_timeout': 5,
+            'open_timeout': timeout,
+        }
+        if test.get('subprotocols'):
+            kwargs['subprotocols'] = test['subprotocols']
+        if test.get('headers'):
+            kwargs[HEADERS_KWARG] = test['headers']
+        if secure:
+            kwargs['ssl'] = ssl_context
+            kwargs['server_hostname'] = parsed.hostname
+
+        started = time.perf_counter()
         async with websockets.connect(url, **kwargs) as ws:
-            print(f"✓ SUCCESS! Connected!")
-            print(f"  Subprotocol selected: {ws.subprotocol}")
-            print(f"  Remote address: {ws.remote_address}")
-            
+            sock = None  # Owned by the connection now
+            handshake = (time.perf_counter() - started) * 1000
+            ssl_object = ws.transport.get_extra_info('ssl_object')
+            if ssl_object is not None:
+                phases['tls'] = (getattr(ssl_object, 'handshake_time', None) or 0) * 1000
+                result['tls'] = f"{ssl_object.version()} {ssl_object.cipher()[0]}"
+            phases['upgrade'] = handshake - phases.get('tls', 0)
+            result['subprotocol'] = ws.subprotocol
+
             # Try sending a test message
+            phase = 'boot'
             test_msg = [2, "test-123", "BootNotification", {
                 "chargePointVendor": "TestVendor",
                 "chargePointModel": "TestModel"
             }]
-            
-            import json
+
+            started = time.perf_counter()
             await ws.send(json.dumps(test_msg))
-            print(f"  ✓ Sent BootNotification")
-            
-            # Wait for response (with timeout)
-            try:
-                response = await asyncio.wait_for(ws.recv(), timeout=5.0)
-                print(f"  ✓ Received response: {response}")
-            except asyncio.TimeoutError:
-                print(f"  ⚠ No response within 5 seconds")
-            
-            return True
-            
-    except websockets.exceptions.InvalidStatusCode as e:
-        print(f"✗ FAILED: HTTP {e.status_code}")
-        print(f"  Response headers: {e.headers}")
+            result['response'] = await asyncio.wait_for(ws.recv(), timeout)
+            phases['boot'] = (time.perf_counter() - started) * 1000
+
+        result['ok'] = True
+
+    except asyncio.TimeoutError:
+        result['failed_phase'] = phase
+        result['error'] = f"Timeout after {timeout}s"
+    except websockets.exceptions.InvalidStatus as e:
+        # TLS and the upgrade share one connect call; an HTTP answer means TLS succeeded
+        result['failed_phase'] = 'upgrade'
+        result['error'] = f"HTTP {e.response.status_code}"
+    except ssl.SSLError as e:
+        result['failed_phase'] = 'tls'
+        result['error'] = f"TLS error: {e}"
     except websockets.exceptions.InvalidUpgrade as e:
-        print(f"✗ FAILED: Invalid upgrade")
-        print(f"  Error: {e}")
+        result['failed_phase'] = 'upgrade'
+        result['error'] = f"Invalid upgrade: {e}"
     except Exception as e:
-        print(f"✗ FAILED: {type(e).__name__}")
-        print(f"  Error: {e}")
-        import traceback
-        traceback.print_exc()
-    
-    return False
+        result['failed_phase'] = phase
+        result['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        if sock is not None:
+            sock.close()
+
+    return result
+
+
+def probe_charger_id(charger_id, index, attempt, shared_id):
+    """Charger ID of one probe: unique per variant and attempt unless --shared-id"""
+    return charger_id if shared_id else f"{charger_id}-T{index}-{attempt}"
+
+
+async def run_tests(tests, ssl_context, concurrency, repeat, timeout, charger_id, shared_id=False):
+    """Run every variant `repeat` times, at most `concurrency` connections at once.
+
+    A CSMS drops (or rejects) one of two connections with the same charger
+    ID, so every probe uses its own ID, and probes that still end up with
+    the same ID (shared_id, or a URL without one) run one after another.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    id_locks = {}
+
+    async def run_one(index, attempt, test):
+        probe_id = probe_charger_id(charger_id, index, attempt, shared_id)
+        probe = dict(test, url=test['url'].format(charger_id=probe_id))
+        # The CSMS takes the charger ID from the last path segment ('ocpp' for the root path variant)
+        path_id = urlparse(probe['url']).path.rstrip('/').rsplit('/', 1)[-1]
+        async with id_locks.setdefault(path_id, asyncio.Lock()), semaphore:
+            result = await test_detailed(probe, ssl_context, timeout)
+        result['test'] = index
+        result['attempt'] = attempt
+        status = "✓" if result['ok'] else f"✗ {result['failed_phase']}: {result['error']}"
+        logger.info(f"Test {index} #{attempt} {test['name']}: {status}")
+        return result
+
+    return await asyncio.gather(*(
+        run_one(index, attempt, test)
+        for attempt in range(1, repeat + 1)
+        for index, test in enumerate(tests, 1)
+    ))
+
+
+def summarize(tests, results):
+    """Aggregate attempts per variant: success count and median time per phase"""
+    summary = []
+    for index, test in enumerate(tests, 1):
+        attempts = [result for result in results if result['test'] == index]
+        ok = [result for result in attempts if result['ok']]
+        phases = {}
+        for phase in PHASES:
+            values = [result['phases_ms'][phase] for result in attempts if phase in result['phases_ms']]
+            if values:
+                phases[phase] = statistics.median(values)
+        failed = [result for result in attempts if not result['ok']]
+        summary.append({
+            'test': index,
+            'name': test['name'],
+            'url': test['url'],
+            'succeeded': len(ok),
+            'attempts': len(attempts),
+            'median_ms': phases,
+            'total_ms': sum(phases.values()),
+            'failed_phase': failed[0]['failed_phase'] if failed else None,
+            'error': failed[0]['error'] if failed else None,
+        })
+    return summary
+
+
+def print_summary(summary):
+    """Print the per-phase timing table"""
+    print(f"\n{'='*96}")
+    print(f"{'#':>2}  {'Variant':<30} {'OK':>5}  " + "".join(f"{phase.upper():>9}" for phase in PHASES) + f"{'TOTAL':>10}")
+    print(f"{'':>2}  {'':<30} {'':>5}  " + "".join(f"{'(ms)':>9}" for _ in PHASES) + f"{'(ms)':>10}")
+    print('-' * 96)
+    for row in summary:
+        cells = "".join(
+            f"{row['median_ms'][phase]:9.1f}" if phase in row['median_ms'] else f"{'-':>9}"
+            for phase in PHASES
+        )
+        print(f"{row['test']:>2}  {row['name'][:30]:<30} {row['succeeded']:>2}/{row['attempts']:<2}  {cells}{row['total_ms']:10.1f}")
+        if row['error']:
+            print(f"{'':>4}✗ {row['failed_phase']}: {row['error']}")
+    print('=' * 96)
+
 
 async def main():
     """Run diagnostic tests"""
-    
+    parser = argparse.ArgumentParser(description='OCPP WebSocket diagnostic')
+    parser.add_argument('--url', default='ws://localhost:8080', help='Base URL (ws:// or wss://) of the OCPP service')
+    parser.add_argument('--ca-cert', help='CA certificate (PEM) for wss://')
+    parser.add_argument('--client-cert', help='Client certificate (PEM) for wss://')
+    parser.add_argument('--client-key', help='Client private key (PEM) for wss://')
+    parser.add_argument('--insecure', action='store_true', help='Skip TLS certificate verification')
+    parser.add_argument('--concurrency', type=int, default=4, help='Maximum probes in flight')
+    parser.add_argument('--repeat', type=int, default=1, help='Attempts per variant (phase times are medians)')
+    parser.add_argument('--timeout', type=float, default=5.0, help='Timeout per phase in seconds')
+    parser.add_argument('--charger-id', default='CHARGER-001',
+                        help='Charger ID in the probe URLs (suffixed per probe so concurrent probes do not collide)')
+    parser.add_argument('--shared-id', action='store_true',
+                        help='Use --charger-id unchanged for every probe (runs them one at a time)')
+    parser.add_argument('--json', metavar='FILE', help="Write a machine-readable report ('-' for stdout)")
+    parser.add_argument('--verbose', action='store_true', help='Debug logging (websockets frames)')
+    args = parser.parse_args()
+
+    # With '--json -' stdout carries only the report: the human-readable output goes to stderr
+    report_stream = sys.stdout
+    if args.json == '-':
+        sys.stdout = sys.stderr
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+    base_url = args.url.rstrip('/')
+    ssl_context = None
+    if base_url.startswith('wss://'):
+        ssl_context = build_ssl_context(args.ca_cert, args.client_cert, args.client_key, args.insecure)
+
     print("\n" + "="*70)
     print("OCPP WebSocket Detailed Diagnostic")
     print("="*70)
     print("\nBackend confirmed running:")
     print("  - OCPP Service: Port 8080, PID 34232")
-    print("  - URL Format: ws://localhost:8080/ocpp/{chargerId}")
+    print(f"  - URL Format: {base_url}/ocpp/{{chargerId}}")
+    print(f"  - Charger IDs: {args.charger_id}" + ("" if args.shared_id else "-T<variant>-<attempt>"))
+    print(f"  - Concurrency: {args.concurrency}, Attempts per variant: {args.repeat}")
     print("="*70)
-    
+
     tests = [
         {
             'name': 'Standard OCPP 1.6',
-            'url': 'ws://localhost:8080/ocpp/CHARGER-001',
+            'url': f'{base_url}/ocpp/{{charger_id}}',
             'subprotocols': ['ocpp1.6'],
             'headers': None
         },
         {
             'name': 'With User-Agent',
-            'url': 'ws://localhost:8080/ocpp/CHARGER-001',
+            'url': f'{base_url}/ocpp/{{charger_id}}',
             'subprotocols': ['ocpp1.6'],
             'headers': {'User-Agent': 'OCPP-Simulator/1.0'}
         },
         {
             'name': 'No subprotocol',
-            'url': 'ws://localhost:8080/ocpp/CHARGER-001',
+            'url': f'{base_url}/ocpp/{{charger_id}}',
             'subprotocols': None,
             'headers': None
         },
         {
             'name': 'Alternative path (no /ocpp)',
-            'url': 'ws://localhost:8080/CHARGER-001',
+            'url': f'{base_url}/{{charger_id}}',
             'subprotocols': ['ocpp1.6'],
             'headers': None
         },
         {
             'name': 'Root path with ID',
-            'url': 'ws://localhost:8080/ocpp',
+            'url': f'{base_url}/ocpp',
             'subprotocols': ['ocpp1.6'],
             'headers': None
         },
         {
             'name': 'With Origin header',
-            'url': 'ws://localhost:8080/ocpp/CHARGER-001',
+            'url': f'{base_url}/ocpp/{{charger_id}}',
             'subprotocols': ['ocpp1.6'],
             'headers': {'Origin': 'http://localhost:3001'}
         },
     ]
-    
-    success = False
-    for i, test in enumerate(tests, 1):
-        print(f"\n\n📊 Test {i}: {test['name']}")
-        result = await test_detailed(
-            test['url'],
-            test.get('subprotocols'),
-            test.get('headers')
-        )
-        if result:
-            success = True
-            print(f"\n{'='*70}")
-            print(f"✓✓✓ WORKING CONFIGURATION FOUND! ✓✓✓")
-            print(f"{'='*70}")
-            print(f"URL: {test['url']}")
-            print(f"Subprotocols: {test.get('subprotocols')}")
-            print(f"Headers: {test.get('headers')}")
-            print(f"{'='*70}")
-            break
-        
-        await asyncio.sleep(0.5)
-    
-    if not success:
+
+    started = time.perf_counter()
+    results = await run_tests(tests, ssl_context, args.concurrency, args.repeat, args.timeout,
+                              args.charger_id, args.shared_id)
+    elapsed = time.perf_counter() - started
+    summary = summarize(tests, results)
+    print_summary(summary)
+    print(f"Completed {len(results)} probes in {elapsed:.2f}s")
+
+    working = [row for row in summary if row['succeeded']]
+    if working:
+        test = tests[working[0]['test'] - 1]
+        print(f"\n{'='*70}")
+        print(f"✓✓✓ WORKING CONFIGURATION FOUND! ✓✓✓")
+        print(f"{'='*70}")
+        print(f"URL: {test['url'].format(charger_id=args.charger_id)}")
+        print(f"Subprotocols: {test.get('subprotocols')}")
+        print(f"Headers: {test.get('headers')}")
+        print(f"{'='*70}")
+    else:
         print(f"\n{'='*70}")
         print("❌ ALL TESTS FAILED")
         print("="*70)
@@ -156,7 +348,24 @@ async def main():
         print("  - Are there any logs showing connection attempts?")
         print("  - Can you share a working connection example?")
         print("="*70)
-    
+
+    if args.json:
+        report = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'url': base_url,
+            'concurrency': args.concurrency,
+            'repeat': args.repeat,
+            'elapsed_s': elapsed,
+            'summary': summary,
+            'results': results,
+        }
+        if args.json == '-':
+            print(json.dumps(report, indent=2), file=report_stream)
+        else:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"\n📝 Report written to {args.json}")
+
     print("\n\n📝 Backend Service Info:")
     print("  Process ID: 34232")
     print("  Port: 8080")
@@ -9,21 +9,67 @@ Requirements:
 
 Usage:
     python mock-ocpp-server.py
+    python mock-ocpp-server.py --id-tags tags.csv --local-list-size 5000
+    python mock-ocpp-server.py --port 3443 --self-signed certs          # wss:// (Security Profile 2)
+    python mock-ocpp-server.py --port 3443 --self-signed certs --client-ca certs/client.pem  # Profile 3
+    python mock-ocpp-server.py --compression deflate --deflate-window-bits 10 --deflate-level 1
+    python mock-ocpp-server.py --audit-dir audit --audit-max-segments 50   # query with ocpp-audit.py
+    python mock-ocpp-server.py --profile yappi --profile-dir profiles    # kill -USR1 <pid> to dump
 
 Features:
     - Accepts OCPP 1.6 WebSocket connections
     - Responds to Boot Notification, Heartbeat, Status Notifications
     - Handles Start/Stop Transaction
-    - Accepts all authorization requests
+    - Authorizes ID tags against an optional tag file (accepts all otherwise)
+    - Pushes a local authorization list to chargers after boot (SendLocalList)
+    - Optional TLS (wss://) with client certificate verification; --self-signed
+      generates a local server/client certificate pair with openssl
     - Logs all OCPP messages
+    - Fast-path routing: CALLs are routed on the OCPP-J envelope (type, ID,
+      action) read straight from the raw frame; the payload is only decoded
+      if a handler reads it (benchmark-envelope.py measures the gain)
+    - Stale-connection detection: chargers silent for --heartbeat-grace
+      heartbeat intervals are marked offline and their open transactions
+      flagged (one sweeping timer for the whole fleet)
+    - Configurable permessage-deflate (--compression off|deflate, --deflate-*)
+      with per-connection wire/payload byte counters and compression ratio
+    - Optional binary audit log of every frame (--audit-dir) in rotating,
+      indexed segments; see ocpp-audit.py for queries
+    - --profile cprofile|yappi|tracemalloc: CPU profile per OCPP action,
+      event-loop lag and allocation snapshots (see ocpp_profiling.py)
+
+ID tag file format (one tag per line, CSV, '#' starts a comment):
+    idTag[,status[,expiryDate[,parentIdTag]]]
+    e.g. RFID-000001,Accepted,2030-12-31T23:59:59Z
 """
 
+import argparse
 import asyncio
+import math
+import os
+import re
+import signal
+import ssl
+import subprocess
+import time
 import websockets
 import json
-from datetime import datetime
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from functools import lru_cache
 import logging
 
+from ocpp_bandwidth import (
+    BandwidthTotals,
+    add_compression_arguments,
+    describe_compression,
+    format_counters,
+    server_serve_options,
+)
+from ocpp_runtime import resource_usage
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -36,6 +82,291 @@ connected_chargers = {}
 active_transactions = {}
 transaction_counter = 1000
 
+AUTHORIZATION_STATUSES = ("Accepted", "Blocked", "Expired", "Invalid", "ConcurrentTx")
+
+
+class IdTagStore:
+    """In-memory ID tag registry with O(1) lookups.
+
+    Tags are kept in a single dict keyed by idTag so the store scales to
+    millions of entries; each value is a compact (status, expiry, parent)
+    tuple with the expiry stored as a POSIX timestamp. Date parsing and
+    formatting are memoized since tag files typically share a few expiry dates.
+    """
+
+    def __init__(self, accept_unknown=True):
+        self.tags = {}
+        self.version = 0
+        self.accept_unknown = accept_unknown
+        self._local_list_cache = None  # (version, max_entries, valid_until, entry count, JSON)
+
+    def __len__(self):
+        return len(self.tags)
+
+    def add(self, id_tag, status="Accepted", expiry=None, parent_id_tag=None):
+        """Add or replace a tag (expiry is a POSIX timestamp or None)"""
+        if status not in AUTHORIZATION_STATUSES:
+            raise ValueError(f"Invalid authorization status: {status}")
+        self.tags[id_tag] = (status, expiry, parent_id_tag)
+        self._local_list_cache = None
+
+    def load(self, filename):
+        """Load tags from a CSV file, streaming line by line"""
+        count = 0
+        with open(filename, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                fields = [field.strip() for field in line.split(",")]
+                if line_no == 1 and fields[0].lower() == "idtag":
+                    continue  # Header row
+                status = fields[1] if len(fields) > 1 and fields[1] else "Accepted"
+                parent = fields[3] if len(fields) > 3 and fields[3] else None
+                try:
+                    expiry = parse_ocpp_datetime(fields[2]) if len(fields) > 2 and fields[2] else None
+                    self.add(fields[0], status, expiry, parent)
+                except ValueError as e:
+                    raise ValueError(f"{filename}:{line_no}: {e}") from None
+                count += 1
+        self.version += 1
+        return count
+
+    def id_tag_info(self, id_tag):
+        """Return the OCPP idTagInfo for a tag"""
+        entry = self.tags.get(id_tag)
+        if entry is None:
+            return {"status": "Accepted" if self.accept_unknown else "Invalid"}
+
+        status, expiry, parent = entry
+        if status == "Accepted" and expiry is not None and expiry < datetime.now(timezone.utc).timestamp():
+            status = "Expired"
+
+        info = {"status": status}
+        if expiry is not None:
+            info["expiryDate"] = format_ocpp_datetime(expiry)
+        if parent:
+            info["parentIdTag"] = parent
+        return info
+
+    def local_list(self, max_entries):
+        """Build SendLocalList entries for the first max_entries tags"""
+        entries = []
+        for id_tag in self.tags:
+            if len(entries) >= max_entries:
+                break
+            entries.append({"idTag": id_tag, "idTagInfo": self.id_tag_info(id_tag)})
+        return entries
+
+    def local_list_json(self, max_entries):
+        """Return (entry count, SendLocalList payload as JSON), built once per tag store version.
+
+        Every booting charger gets the same list, so a boot storm must not
+        rebuild it per charger. The cache is also dropped when a listed
+        Accepted tag expires, since its status changes to Expired.
+        """
+        now = datetime.now(timezone.utc).timestamp()
+        cached = self._local_list_cache
+        if cached and cached[0] == self.version and cached[1] == max_entries and now < cached[2]:
+            return cached[3], cached[4]
+        
+        entries = self.local_list(max_entries)
+        valid_until = min(
+            (expiry for status, expiry, _ in (self.tags[entry["idTag"]] for entry in entries)
+             if status == "Accepted" and expiry is not None and expiry >= now),
+            default=float("inf"),
+        )
+        payload = json.dumps({
+            "listVersion": self.version,
+            "updateType": "Full",
+            "localAuthorizationList": entries,
+        })
+        self._local_list_cache = (self.version, max_entries, valid_until, len(entries), payload)
+        return len(entries), payload
+
+
+@lru_cache(maxsize=4096)
+def parse_ocpp_datetime(value):
+    """Parse an OCPP (ISO 8601) date-time string into a POSIX timestamp"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+@lru_cache(maxsize=4096)
+def format_ocpp_datetime(timestamp):
+    """Format a POSIX timestamp as an OCPP date-time string"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# [2, "MessageId", "Action", { - enough to route a CALL without decoding the payload.
+# Message IDs with escapes and anything else unusual fall back to json.loads.
+CALL_ENVELOPE = re.compile(rb'\s*\[\s*2\s*,\s*"([^"\\]*)"\s*,\s*"([A-Za-z0-9]+)"\s*,\s*(?=\{)')
+WHITESPACE = re.compile(rb'\s*')
+
+# Patterns and delimiters per frame type: the legacy websockets implementation yields str
+CALL_SYNTAX = {
+    bytes: (CALL_ENVELOPE, WHITESPACE, b'}', b']'),
+    str: (re.compile(CALL_ENVELOPE.pattern.decode(), re.ASCII), re.compile(r'\s*', re.ASCII), '}', ']'),
+}
+
+
+class LazyPayload(Mapping):
+    """Read-only CALL payload that is JSON-decoded on first access.
+
+    Handlers that only answer (Heartbeat, MeterValues, StatusNotification
+    at WARNING log level) never touch it, so their frames are never decoded
+    and the payload is never copied out of the frame.
+    """
+
+    __slots__ = ('_frame', '_start', '_end', '_decoded')
+
+    def __init__(self, frame, start, end):
+        self._frame = frame
+        self._start = start
+        self._end = end
+        self._decoded = None
+
+    @property
+    def decoded(self):
+        if self._decoded is None:
+            try:
+                self._decoded = json.loads(self._frame[self._start:self._end])
+            except json.JSONDecodeError:
+                # More than one value before the final ']' (a CALL with extra
+                # elements): decode the whole frame like the slow path does
+                self._decoded = json.loads(self._frame)[3]
+        return self._decoded
+
+    def __getitem__(self, key):
+        return self.decoded[key]
+
+    def get(self, key, default=None):
+        return self.decoded.get(key, default)
+
+    def __iter__(self):
+        return iter(self.decoded)
+
+    def __len__(self):
+        return len(self.decoded)
+
+    def __repr__(self):
+        return repr(self.decoded)
+
+
+def parse_call(frame):
+    """Return (msg_id, action, LazyPayload) for a CALL frame, or None to take the full json.loads path"""
+    envelope, whitespace, close_object, close_array = CALL_SYNTAX[type(frame)]
+    match = envelope.match(frame)
+    if match is None:
+        return None
+    # Offsets only: the payload is sliced out of the frame when it is decoded
+    start = match.end()
+    close = frame.rfind(close_array)
+    if close < start or (close + 1 < len(frame) and whitespace.fullmatch(frame, close + 1) is None):
+        return None
+    # The payload must be the object that closes right before the final ']';
+    # anything else ('{...},7') takes the json.loads path
+    end = frame.rfind(close_object, start, close) + 1
+    if not end or (end < close and whitespace.fullmatch(frame, end, close) is None):
+        return None
+    message_id, action = match.groups()
+    if isinstance(frame, bytes):
+        message_id, action = message_id.decode(), action.decode()
+    return message_id, action, LazyPayload(frame, start, end)
+
+
+async def incoming_frames(websocket):
+    """Yield received frames; text frames stay undecoded UTF-8 bytes where websockets allows it"""
+    if not hasattr(websocket, 'request'):  # Legacy websockets implementation
+        async for message in websocket:
+            yield message
+        return
+    try:
+        while True:
+            yield await websocket.recv(decode=False)
+    except websockets.exceptions.ConnectionClosedOK:
+        return
+
+
+class LivenessTracker:
+    """Heartbeat deadlines for connected chargers, checked by one sweeping timer.
+
+    Deadlines are kept in a timing wheel: buckets of charger IDs keyed by the
+    tick in which they expire. Seeing a charger moves it to a later bucket
+    (O(1), and usually a no-op when it sends faster than the resolution), and
+    a sweep only pops the buckets for the ticks elapsed since the previous
+    sweep, so its cost is proportional to the chargers that actually expired,
+    not to the fleet size.
+    """
+
+    def __init__(self, timeout, resolution=1.0):
+        self.timeout = timeout
+        self.resolution = resolution
+        self.buckets = defaultdict(set)  # tick -> charger IDs whose deadline falls in it
+        self.due_tick = {}  # charger ID -> tick of its bucket
+        self.stale = {}  # charger ID -> monotonic time it was marked stale
+        self.swept_tick = math.floor(time.monotonic() / resolution)
+        self.stale_events = 0
+        self.recoveries = 0
+
+    def seen(self, charge_point_id, now):
+        """Record a message from a charger; returns True if it was stale until now"""
+        tick = math.ceil((now + self.timeout) / self.resolution)
+        old_tick = self.due_tick.get(charge_point_id)
+        if old_tick != tick:
+            if old_tick is not None:
+                self.buckets[old_tick].discard(charge_point_id)
+            self.buckets[tick].add(charge_point_id)
+            self.due_tick[charge_point_id] = tick
+        if charge_point_id in self.stale:
+            del self.stale[charge_point_id]
+            self.recoveries += 1
+            return True
+        return False
+
+    def forget(self, charge_point_id):
+        """Stop tracking a disconnected charger; returns True if it was stale"""
+        tick = self.due_tick.pop(charge_point_id, None)
+        if tick is not None:
+            self.buckets[tick].discard(charge_point_id)
+        return self.stale.pop(charge_point_id, None) is not None
+
+    def sweep(self, now):
+        """Mark chargers whose deadline has passed as stale; returns the newly stale IDs"""
+        current_tick = math.floor(now / self.resolution)
+        expired = []
+        for tick in range(self.swept_tick + 1, current_tick + 1):
+            for charge_point_id in self.buckets.pop(tick, ()):
+                del self.due_tick[charge_point_id]
+                self.stale[charge_point_id] = now
+                expired.append(charge_point_id)
+        self.swept_tick = max(self.swept_tick, current_tick)
+        self.stale_events += len(expired)
+        return expired
+
+
+id_tag_store = IdTagStore()
+local_list_size = 0
+heartbeat_interval = 30
+
+# Stale-connection detection (--heartbeat-grace); None when disabled
+liveness = None
+transactions_by_charger = defaultdict(set)  # charge point ID -> open transaction IDs
+flagged_transactions = set()  # Open transactions of connected stale chargers
+
+# Traffic counters for --stats-file
+message_counts = Counter()
+peak_connections = 0
+bandwidth = BandwidthTotals()  # Byte counters of closed connections
+
+# ocpp_profiling.Profiler when running with --profile
+profiler = None
+
+# ocpp_audit.AuditLog when running with --audit-dir
+audit_log = None
+
 
 async def handle_charge_point(websocket):
     """Handle OCPP messages from a charge point"""
@@ -47,79 +378,63 @@ async def handle_charge_point(websocket):
     if not charge_point_id:
         charge_point_id = "UNKNOWN"
     
+    global peak_connections
     connected_chargers[charge_point_id] = websocket
+    peak_connections = max(peak_connections, len(connected_chargers))
     logger.info(f"{'='*60}")
     logger.info(f"✓ Charge Point Connected: {charge_point_id}")
     logger.info(f"  Connection from: {websocket.remote_address}")
     logger.info(f"{'='*60}")
     
+    # A stale charger that reconnects (typically over a half-open old link) has recovered
+    if liveness and liveness.seen(charge_point_id, time.monotonic()):
+        mark_charger_recovered(charge_point_id)
+    
     try:
-        async for message in websocket:
-            # Parse OCPP message
-            data = json.loads(message)
+        async for message in incoming_frames(websocket):
+            if liveness and liveness.seen(charge_point_id, time.monotonic()):
+                mark_charger_recovered(charge_point_id)
             
             # OCPP message format: [MessageTypeId, MessageId, Action, Payload]
-            msg_type = data[0]
-            msg_id = data[1]
+            call = parse_call(message)
+            if call is not None:
+                msg_type = 2
+                msg_id, action, payload = call
+            else:
+                # CALLRESULT / CALLERROR and frames the fast path does not handle
+                data = json.loads(message)
+                msg_type = data[0]
+                msg_id = data[1]
+                if msg_type == 2:
+                    action = data[2]
+                    payload = data[3] if len(data) > 3 else {}
+            
+            if audit_log:
+                audit_log.record(charge_point_id, 'in', action if msg_type == 2 else None, message)
             
             if msg_type == 2:  # CALL
-                action = data[2]
-                payload = data[3] if len(data) > 3 else {}
-                
-                logger.info(f"← [{charge_point_id}] {action}")
-                logger.debug(f"   Payload: {payload}")
-                
-                # Handle different OCPP actions
-                response = None
-                
-                if action == "BootNotification":
-                    response = handle_boot_notification(msg_id, payload)
-                    logger.info(f"   Model: {payload.get('chargePointModel', 'Unknown')}")
-                    logger.info(f"   Vendor: {payload.get('chargePointVendor', 'Unknown')}")
-                
-                elif action == "Heartbeat":
-                    response = handle_heartbeat(msg_id)
-                
-                elif action == "StatusNotification":
-                    response = handle_status_notification(msg_id, payload)
-                    logger.info(f"   Status: {payload.get('status', 'Unknown')}")
-                    logger.info(f"   Connector: {payload.get('connectorId', 0)}")
-                
-                elif action == "Authorize":
-                    response = handle_authorize(msg_id, payload)
-                    logger.info(f"   ID Tag: {payload.get('idTag', 'Unknown')}")
-                
-                elif action == "StartTransaction":
-                    response = handle_start_transaction(msg_id, payload, charge_point_id)
-                    logger.info(f"   ID Tag: {payload.get('idTag', 'Unknown')}")
-                    logger.info(f"   Connector: {payload.get('connectorId', 0)}")
-                    logger.info(f"   Meter Start: {payload.get('meterStart', 0)} Wh")
-                
-                elif action == "StopTransaction":
-                    response = handle_stop_transaction(msg_id, payload)
-                    logger.info(f"   Transaction ID: {payload.get('transactionId', 0)}")
-                    logger.info(f"   Meter Stop: {payload.get('meterStop', 0)} Wh")
-                
-                elif action == "MeterValues":
-                    response = handle_meter_values(msg_id, payload)
-                    meter_value = payload.get('meterValue', [{}])[0].get('sampledValue', [{}])[0].get('value', 0)
-                    logger.info(f"   Meter Value: {meter_value} Wh")
+                message_counts[action] += 1
                 
-                elif action == "DataTransfer":
-                    response = handle_data_transfer(msg_id, payload)
+                # %-style arguments: no string is built at WARNING level (once per message)
+                logger.info("← [%s] %s", charge_point_id, action)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"   Payload: {payload}")
                 
-                else:
-                    # Unknown action - send generic acceptance
-                    logger.warning(f"   Unknown action: {action}")
-                    response = [3, msg_id, {"status": "Accepted"}]
+                # Only synchronous work is profiled: awaiting the send would charge
+                # the CPU time of other connections to this action
+                with profiler.action(action) if profiler else nullcontext():
+                    response = handle_call(charge_point_id, msg_id, action, payload)
+                    frame = json.dumps(response) if response else None
                 
                 # Send response
-                if response:
-                    await websocket.send(json.dumps(response))
-                    logger.info(f"→ [{charge_point_id}] Response sent")
+                if frame is not None:
+                    await websocket.send(frame)
+                    if audit_log:
+                        audit_log.record(charge_point_id, 'out', action, frame)
+                    logger.info("→ [%s] Response sent", charge_point_id)
             
             elif msg_type == 3:  # CALLRESULT
-                logger.info(f"← [{charge_point_id}] CALLRESULT")
+                logger.info("← [%s] CALLRESULT", charge_point_id)
             
             elif msg_type == 4:  # CALLERROR
                 logger.error(f"← [{charge_point_id}] CALLERROR: {data}")
@@ -131,14 +446,72 @@ async def handle_charge_point(websocket):
     except Exception as e:
         logger.error(f"Error handling message: {e}")
     finally:
-        # Clean up
-        if charge_point_id in connected_chargers:
+        # Clean up - unless the charger has already reconnected and the new socket owns its state
+        if connected_chargers.get(charge_point_id) is websocket:
             del connected_chargers[charge_point_id]
+            if liveness and liveness.forget(charge_point_id):
+                unflag_transactions(charge_point_id)
+        bandwidth.add(websocket)
         logger.info(f"{'='*60}")
         logger.info(f"Charge Point Disconnected: {charge_point_id}")
+        if hasattr(websocket, 'counters'):
+            logger.info(f"  Bytes {format_counters(websocket.counters())}")
         logger.info(f"{'='*60}")
 
 
+def handle_call(charge_point_id, msg_id, action, payload):
+    """Dispatch a CALL to its handler and return the CALLRESULT"""
+    response = None
+    
+    if action == "BootNotification":
+        response = handle_boot_notification(msg_id, payload)
+        logger.info(f"   Model: {payload.get('chargePointModel', 'Unknown')}")
+        logger.info(f"   Vendor: {payload.get('chargePointVendor', 'Unknown')}")
+        if local_list_size and len(id_tag_store):
+            asyncio.ensure_future(push_local_list(charge_point_id, local_list_size))
+    
+    elif action == "Heartbeat":
+        response = handle_heartbeat(msg_id)
+    
+    elif action == "StatusNotification":
+        response = handle_status_notification(msg_id, payload)
+        if logger.isEnabledFor(logging.INFO):  # Don't decode the payload just to skip the log line
+            logger.info(f"   Status: {payload.get('status', 'Unknown')}")
+            logger.info(f"   Connector: {payload.get('connectorId', 0)}")
+    
+    elif action == "Authorize":
+        response = handle_authorize(msg_id, payload)
+        logger.info(f"   ID Tag: {payload.get('idTag', 'Unknown')}")
+        logger.info(f"   Status: {response[2]['idTagInfo']['status']}")
+    
+    elif action == "StartTransaction":
+        response = handle_start_transaction(msg_id, payload, charge_point_id)
+        logger.info(f"   ID Tag: {payload.get('idTag', 'Unknown')}")
+        logger.info(f"   Connector: {payload.get('connectorId', 0)}")
+        logger.info(f"   Meter Start: {payload.get('meterStart', 0)} Wh")
+    
+    elif action == "StopTransaction":
+        response = handle_stop_transaction(msg_id, payload)
+        logger.info(f"   Transaction ID: {payload.get('transactionId', 0)}")
+        logger.info(f"   Meter Stop: {payload.get('meterStop', 0)} Wh")
+    
+    elif action == "MeterValues":
+        response = handle_meter_values(msg_id, payload)
+        if logger.isEnabledFor(logging.INFO):
+            meter_value = payload.get('meterValue', [{}])[0].get('sampledValue', [{}])[0].get('value', 0)
+            logger.info(f"   Meter Value: {meter_value} Wh")
+    
+    elif action == "DataTransfer":
+        response = handle_data_transfer(msg_id, payload)
+    
+    else:
+        # Unknown action - send generic acceptance
+        logger.warning(f"   Unknown action: {action}")
+        response = [3, msg_id, {"status": "Accepted"}]
+    
+    return response
+
+
 def handle_boot_notification(msg_id, payload):
     """Handle Boot Notification"""
     return [
@@ -147,7 +520,7 @@ def handle_boot_notification(msg_id, payload):
         {
             "status": "Accepted",
             "currentTime": datetime.utcnow().isoformat() + "Z",
-            "interval": 30  # Heartbeat interval in seconds
+            "interval": heartbeat_interval  # Heartbeat interval in seconds
         }
     ]
 
@@ -169,15 +542,12 @@ def handle_status_notification(msg_id, payload):
 
 
 def handle_authorize(msg_id, payload):
-    """Handle Authorization - Accept all"""
+    """Handle Authorization - Look up the ID tag store"""
     return [
         3,
         msg_id,
         {
-            "idTagInfo": {
-                "status": "Accepted",
-                "expiryDate": "2030-12-31T23:59:59Z"
-            }
+            "idTagInfo": id_tag_store.id_tag_info(payload.get("idTag", ""))
         }
     ]
 
@@ -190,6 +560,7 @@ def handle_start_transaction(msg_id, payload, charge_point_id):
     transaction_counter += 1
     
     # Store transaction
+    transactions_by_charger[charge_point_id].add(transaction_id)
     active_transactions[transaction_id] = {
         "chargePointId": charge_point_id,
         "connectorId": payload.get("connectorId", 1),
@@ -205,9 +576,7 @@ def handle_start_transaction(msg_id, payload, charge_point_id):
         msg_id,
         {
             "transactionId": transaction_id,
-            "idTagInfo": {
-                "status": "Accepted"
-            }
+            "idTagInfo": id_tag_store.id_tag_info(payload.get("idTag", ""))
         }
     ]
 
@@ -227,14 +596,18 @@ def handle_stop_transaction(msg_id, payload):
         
         # Remove transaction
         del active_transactions[transaction_id]
+        flagged_transactions.discard(transaction_id)
+        open_transactions = transactions_by_charger[transaction["chargePointId"]]
+        open_transactions.discard(transaction_id)
+        if not open_transactions:
+            del transactions_by_charger[transaction["chargePointId"]]
     
+    id_tag = payload.get("idTag")
     return [
         3,
         msg_id,
         {
-            "idTagInfo": {
-                "status": "Accepted"
-            }
+            "idTagInfo": id_tag_store.id_tag_info(id_tag) if id_tag else {"status": "Accepted"}
         }
     ]
 
@@ -255,8 +628,63 @@ def handle_data_transfer(msg_id, payload):
     ]
 
 
-async def send_remote_command(charge_point_id, action, payload):
-    """Send a remote command to a charge point"""
+def mark_charger_stale(charge_point_id):
+    """Mark a charger that missed its heartbeat deadline offline and flag its open transactions"""
+    transaction_ids = transactions_by_charger.get(charge_point_id, ())
+    for transaction_id in transaction_ids:
+        active_transactions[transaction_id]["stale"] = True
+        flagged_transactions.add(transaction_id)
+    logger.info(f"⚠ Charge point stale: {charge_point_id} (no message for {liveness.timeout:.0f}s, "
+                f"{len(transaction_ids)} open transaction(s) flagged)")
+
+
+def unflag_transactions(charge_point_id):
+    """Clear the stale flag of a charger's open transactions.
+
+    Flags only cover connected stale chargers, so a stale charger that
+    disconnects is unflagged too and online, stale and flagged_transactions
+    in liveness_counts() keep describing the same set of connections.
+    """
+    for transaction_id in transactions_by_charger.get(charge_point_id, ()):
+        active_transactions[transaction_id]["stale"] = False
+        flagged_transactions.discard(transaction_id)
+
+
+def mark_charger_recovered(charge_point_id):
+    """A stale charger sent a message again"""
+    unflag_transactions(charge_point_id)
+    logger.info(f"✓ Charge point back online: {charge_point_id}")
+
+
+def liveness_counts():
+    """Online/stale charger and flagged transaction counts (all O(1))"""
+    if liveness is None:
+        return None
+    return {
+        "online": len(connected_chargers) - len(liveness.stale),
+        "stale": len(liveness.stale),
+        "flagged_transactions": len(flagged_transactions),
+        "stale_events": liveness.stale_events,
+        "recoveries": liveness.recoveries,
+        "timeout_s": liveness.timeout,
+    }
+
+
+async def sweep_stale_chargers():
+    """Single timer that expires heartbeat deadlines for the whole fleet"""
+    while True:
+        await asyncio.sleep(liveness.resolution)
+        expired = liveness.sweep(time.monotonic())
+        for charge_point_id in expired:
+            mark_charger_stale(charge_point_id)
+        if expired:
+            counts = liveness_counts()
+            logger.warning(f"⚠ {len(expired)} charger(s) went stale - online {counts['online']}, "
+                           f"stale {counts['stale']}, flagged transactions {counts['flagged_transactions']}")
+
+
+async def send_remote_command(charge_point_id, action, payload=None, encoded_payload=None):
+    """Send a remote command to a charge point (encoded_payload: payload already serialized as JSON)"""
     if charge_point_id not in connected_chargers:
         logger.error(f"Charge point {charge_point_id} not connected")
         return None
@@ -264,10 +692,14 @@ async def send_remote_command(charge_point_id, action, payload):
     ws = connected_chargers[charge_point_id]
     msg_id = str(int(datetime.utcnow().timestamp() * 1000))
     
-    message = [2, msg_id, action, payload]
+    if encoded_payload is None:
+        encoded_payload = json.dumps(payload)
+    message = f"[2, {json.dumps(msg_id)}, {json.dumps(action)}, {encoded_payload}]"
     
     try:
-        await ws.send(json.dumps(message))
+        await ws.send(message)
+        if audit_log:
+            audit_log.record(charge_point_id, 'out', action, message)
         logger.info(f"→ [{charge_point_id}] {action} command sent")
         return msg_id
     except Exception as e:
@@ -275,24 +707,151 @@ async def send_remote_command(charge_point_id, action, payload):
         return None
 
 
+async def push_local_list(charge_point_id, max_entries):
+    """Send a full local authorization list to a charge point"""
+    count, payload = id_tag_store.local_list_json(max_entries)
+    logger.info(f"   Pushing local list ({count} tags, version {id_tag_store.version})")
+    return await send_remote_command(charge_point_id, "SendLocalList", encoded_payload=payload)
+
+
+def generate_self_signed_certs(directory):
+    """Create self-signed server and client certificates for local TLS testing"""
+    os.makedirs(directory, exist_ok=True)
+    for name, subject_alt_name in (("server", "DNS:localhost,IP:127.0.0.1"), ("client", None)):
+        cert = os.path.join(directory, f"{name}.pem")
+        key = os.path.join(directory, f"{name}.key")
+        if os.path.exists(cert) and os.path.exists(key):
+            continue
+        command = [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", cert, "-days", "365",
+            "-subj", f"/CN={'localhost' if name == 'server' else 'ocpp-simulator'}",
+        ]
+        if subject_alt_name:
+            command += ["-addext", f"subjectAltName={subject_alt_name}"]
+        subprocess.run(command, check=True, capture_output=True)
+        logger.info(f"Generated {cert}")
+    return os.path.join(directory, "server.pem"), os.path.join(directory, "server.key")
+
+
+def build_ssl_context(certfile, keyfile, client_ca=None):
+    """Create the server SSLContext (client certificates required if client_ca is set)"""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+    if client_ca:
+        context.load_verify_locations(client_ca)
+        context.verify_mode = ssl.CERT_REQUIRED
+    return context
+
+
+def write_stats_file(filename, uptime, cpu_start_s, rss_start_kb):
+    """Write message counts, byte counters and resource usage as JSON"""
+    cpu_seconds, rss_peak_kb = resource_usage()
+    totals = BandwidthTotals()
+    totals.merge(bandwidth)
+    for websocket in connected_chargers.values():
+        totals.add(websocket)
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump({
+            'uptime_s': round(uptime, 3),
+            'messages': dict(message_counts),
+            'peak_connections': peak_connections,
+            'bandwidth': totals.summary(),
+            'audit': audit_log.stats() if audit_log else None,
+            'liveness': liveness_counts(),
+            'cpu_s': cpu_seconds,
+            'cpu_start_s': cpu_start_s,
+            'rss_start_kb': rss_start_kb,
+            'rss_peak_kb': rss_peak_kb,
+        }, f, indent=2)
+    logger.info(f"Stats written to {filename}")
+
+
 async def main():
     """Start the OCPP Central System server"""
+    global id_tag_store, local_list_size, heartbeat_interval, profiler, audit_log, liveness
+    
+    parser = argparse.ArgumentParser(description='Mock OCPP 1.6 Central System Server')
+    parser.add_argument('--host', default='localhost', help='Host to listen on')
+    parser.add_argument('--port', type=int, default=3001, help='Port to listen on')
+    parser.add_argument('--id-tags', help='CSV file of known ID tags (accepts all tags if omitted)')
+    parser.add_argument('--accept-unknown', action='store_true',
+                        help='Accept ID tags missing from the tag file')
+    parser.add_argument('--local-list-size', type=int, default=0,
+                        help='Push up to N tags to each charger via SendLocalList after boot')
+    parser.add_argument('--certfile', help='Server certificate (PEM) - enables wss://')
+    parser.add_argument('--keyfile', help='Server private key (PEM)')
+    parser.add_argument('--client-ca', help='CA (PEM) used to require and verify client certificates')
+    parser.add_argument('--self-signed', metavar='DIR',
+                        help='Generate (if missing) and use self-signed certificates in DIR')
+    add_compression_arguments(parser)
+    parser.add_argument('--heartbeat-interval', type=int, default=30,
+                        help='Heartbeat interval (s) returned in BootNotification responses')
+    parser.add_argument('--heartbeat-grace', type=float, default=2.0,
+                        help='Mark a charger stale after this many heartbeat intervals without a message (0 = off)')
+    parser.add_argument('--stale-check-interval', type=float, default=1.0,
+                        help='Resolution (s) of the stale-connection sweep')
+    parser.add_argument('--log-level', default='INFO', help='Logging level (use WARNING under load)')
+    parser.add_argument('--stats-file', help='Write message counts and resource usage (JSON) here on exit')
+    parser.add_argument('--audit-dir', help='Write a binary audit log of every frame to DIR (see ocpp-audit.py)')
+    parser.add_argument('--audit-segment-mb', type=float, default=64, help='Rotate audit segments at this size')
+    parser.add_argument('--audit-max-segments', type=int, default=0,
+                        help='Keep at most N audit segments, deleting the oldest (0 = keep all)')
+    parser.add_argument('--audit-queue-size', type=int, default=100000,
+                        help='Audit records buffered for the writer thread before new ones are dropped')
+    parser.add_argument('--profile', choices=['cprofile', 'yappi', 'tracemalloc'],
+                        help='Profile the server; results are written on exit and on SIGUSR1')
+    parser.add_argument('--profile-dir', default='profiles', help='Directory for --profile output')
+    args = parser.parse_args()
+    
+    logging.getLogger().setLevel(args.log_level.upper())
+    heartbeat_interval = args.heartbeat_interval
+    if args.heartbeat_grace > 0:
+        liveness = LivenessTracker(args.heartbeat_interval * args.heartbeat_grace, args.stale_check_interval)
+    started = time.perf_counter()
+    cpu_start_s, rss_start_kb = resource_usage()
+    
+    if args.self_signed:
+        args.certfile, args.keyfile = generate_self_signed_certs(args.self_signed)
+    ssl_context = build_ssl_context(args.certfile, args.keyfile, args.client_ca) if args.certfile else None
+    scheme = "wss" if ssl_context else "ws"
+    
+    local_list_size = args.local_list_size
+    if args.id_tags:
+        id_tag_store = IdTagStore(accept_unknown=args.accept_unknown)
+        load_started = datetime.now()
+        count = id_tag_store.load(args.id_tags)
+        elapsed = (datetime.now() - load_started).total_seconds()
+        logger.info(f"Loaded {count} ID tags from {args.id_tags} in {elapsed:.2f}s")
     
     print("=" * 70)
     print(" Mock OCPP 1.6 Central System Server")
     print("=" * 70)
     print()
     print(" Server Configuration:")
-    print("   - Host: localhost")
-    print("   - Port: 3001")
-    print("   - Protocol: OCPP 1.6 (WebSocket)")
+    print(f"   - Host: {args.host}")
+    print(f"   - Port: {args.port}")
+    print(f"   - Protocol: OCPP 1.6 (WebSocket{' over TLS' if ssl_context else ''})")
     print("   - Subprotocol: ocpp1.6")
+    print(f"   - Compression: {describe_compression(args)}")
+    print()
+    print(f"   - ID Tags: {len(id_tag_store) if args.id_tags else 'accept all'}")
+    print(f"   - Stale after: {f'{liveness.timeout:g}s without a message' if liveness else 'disabled'}")
+    if args.audit_dir:
+        print(f"   - Audit log: {args.audit_dir} (python ocpp-audit.py query --dir {args.audit_dir} --charger <ID>)")
     print()
     print(" WebSocket URL:")
-    print("   ws://localhost:3001/ocpp/{ChargePointId}")
+    print(f"   {scheme}://{args.host}:{args.port}/ocpp/{{ChargePointId}}")
     print()
     print(" Example:")
-    print("   ws://localhost:3001/ocpp/TEST-CP-001")
+    print(f"   {scheme}://{args.host}:{args.port}/ocpp/TEST-CP-001")
+    if args.self_signed:
+        print()
+        print(" Simulator:")
+        print(f"   python ocpp-simulator.py --url {scheme}://localhost:{args.port}/ocpp"
+              f" --ca-cert {os.path.join(args.self_signed, 'server.pem')}"
+              f" --client-cert {os.path.join(args.self_signed, 'client.pem')}"
+              f" --client-key {os.path.join(args.self_signed, 'client.key')}")
     print()
     print("=" * 70)
     print(" Server Status: RUNNING")
@@ -300,22 +859,49 @@ async def main():
     print("=" * 70)
     print()
     
+    if args.audit_dir:
+        from ocpp_audit import AuditLog
+        audit_log = AuditLog(args.audit_dir, int(args.audit_segment_mb * 1024 * 1024), args.audit_max_segments,
+                             args.audit_queue_size)
+        audit_log.start()
+    
+    if args.profile:
+        from ocpp_profiling import Profiler
+        profiler = Profiler(args.profile, args.profile_dir, 'mock-ocpp-server')
+        profiler.start()
+    
     try:
         async with websockets.serve(
             handle_charge_point,
-            "localhost",
-            3001,
+            args.host,
+            args.port,
             subprotocols=['ocpp1.6'],
             ping_interval=30,
-            ping_timeout=10
+            ping_timeout=10,
+            ssl=ssl_context,
+            **server_serve_options(args)
         ):
-            await asyncio.Future()  # Run forever
+            if liveness:
+                asyncio.ensure_future(sweep_stale_chargers())
+            stop = asyncio.get_running_loop().create_future()
+            try:
+                asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set_result, None)
+            except (NotImplementedError, AttributeError):  # Windows
+                pass
+            await stop  # Run until Ctrl+C or SIGTERM
     except KeyboardInterrupt:
         print("\n" + "=" * 70)
         print(" Server stopped by user")
         print("=" * 70)
     except Exception as e:
         logger.error(f"Server error: {e}")
+    finally:
+        if profiler:
+            profiler.stop()
+        if audit_log:
+            audit_log.close()
+        if args.stats_file:
+            write_stats_file(args.stats_file, time.perf_counter() - started, cpu_start_s, rss_start_kb)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+OCPP Audit Log Query
+--------------------
+Reads the binary audit log written by mock-ocpp-server.py --audit-dir.
+
+Usage:
+    python ocpp-audit.py segments --dir audit
+    python ocpp-audit.py query --dir audit --charger CP-0421 \\
+        --from 2026-10-18T10:00:00 --to 2026-10-18T10:05:00
+    python ocpp-audit.py query --dir audit --charger CP-0421 --action MeterValues --jsonl
+    python ocpp-audit.py reindex --dir audit
+
+Times are ISO 8601 (local time unless they carry an offset or 'Z') or POSIX
+timestamps. Charger queries use the per-segment index (mmap + seek) and skip
+segments outside the time range, so they stay fast on multi-GB logs.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from ocpp_audit import build_index, index_path, list_segments, query, read_index_header
+
+
+def parse_time(value):
+    """ISO 8601 (naive = local time) or POSIX timestamp to a POSIX timestamp"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed.timestamp()
+
+
+def format_time(timestamp, utc=False):
+    moment = datetime.fromtimestamp(timestamp, timezone.utc if utc else None)
+    return moment.isoformat(timespec='milliseconds')
+
+
+def command_query(args):
+    since = parse_time(args.since) if args.since else None
+    until = parse_time(args.until) if args.until else None
+    started = time.perf_counter()
+    count = 0
+    for record in query(args.dir, args.charger, since, until):
+        if args.action and record['action'] != args.action:
+            continue
+        if args.direction and record['direction'] != args.direction:
+            continue
+        count += 1
+        if args.jsonl:
+            print(json.dumps(record))
+        else:
+            arrow = '←' if record['direction'] == 'in' else '→'
+            print(f"{format_time(record['timestamp'], args.utc)} {arrow} [{record['charger_id']}] "
+                  f"{record['action'] or '-'} {record['frame']}")
+        if args.limit and count >= args.limit:
+            break
+    print(f"{count} records in {time.perf_counter() - started:.3f}s", file=sys.stderr)
+
+
+def command_segments(args):
+    segments = list_segments(args.dir)
+    print(f"{'SEGMENT':<22}{'SIZE MB':>10}{'RECORDS':>10}  TIME RANGE")
+    for segment in segments:
+        size_mb = os.path.getsize(segment) / 1024 / 1024
+        header = read_index_header(segment)
+        if header is None:
+            print(f"{os.path.basename(segment):<22}{size_mb:>10.1f}{'-':>10}  (unsealed - scanned sequentially)")
+            continue
+        records, first, last = header
+        span = f"{format_time(first, args.utc)} .. {format_time(last, args.utc)}" if records else "(empty)"
+        print(f"{os.path.basename(segment):<22}{size_mb:>10.1f}{records:>10}  {span}")
+
+
+def command_reindex(args):
+    for segment in list_segments(args.dir):
+        if args.all or not os.path.exists(index_path(segment)):
+            print(f"{os.path.basename(segment)}: {build_index(segment)} records indexed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the mock OCPP server audit log')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    query_parser = subparsers.add_parser('query', help='Print frames for a charger and/or time range')
+    query_parser.add_argument('--charger', help='Charge point ID')
+    query_parser.add_argument('--from', dest='since', help='Start time (ISO 8601 or POSIX timestamp)')
+    query_parser.add_argument('--to', dest='until', help='End time (ISO 8601 or POSIX timestamp)')
+    query_parser.add_argument('--action', help='Only this OCPP action')
+    query_parser.add_argument('--direction', choices=['in', 'out'], help='Only frames received (in) or sent (out)')
+    query_parser.add_argument('--limit', type=int, default=0, help='Stop after N records')
+    query_parser.add_argument('--jsonl', action='store_true', help='Print one JSON object per record')
+    query_parser.set_defaults(handler=command_query)
+
+    segments_parser = subparsers.add_parser('segments', help='List segments with record counts and time ranges')
+    segments_parser.set_defaults(handler=command_segments)
+
+    reindex_parser = subparsers.add_parser('reindex', help='Build missing segment indexes')
+    reindex_parser.add_argument('--all', action='store_true', help='Rebuild every index')
+    reindex_parser.set_defaults(handler=command_reindex)
+
+    for subparser in (query_parser, segments_parser, reindex_parser):
+        subparser.add_argument('--dir', default='audit', help='Audit directory (mock-ocpp-server.py --audit-dir)')
+    for subparser in (query_parser, segments_parser):
+        subparser.add_argument('--utc', action='store_true', help='Print times in UTC instead of local time')
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
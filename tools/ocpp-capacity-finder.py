@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+OCPP Capacity Finder
+--------------------
+Answers "how many chargers can this backend take?" by ramping load until a
+latency SLO breaks.
+
+Each step opens N probe connections (the Heartbeat probe from
+test-ocpp-connection.py), lets them settle for --warmup seconds and then
+measures p99 Heartbeat RTT and error rate for --step-duration seconds.
+Connections grow by --step (or by a factor with --growth) and the Heartbeat
+interval shrinks by --rate-factor, until the SLO is violated. Once
+--max-connections is reached, a --rate-factor above 1 keeps raising the
+rate (down to --min-interval). The gap between the last passing and first
+failing step is then bisected --refine times.
+
+Requirements:
+    pip install websockets
+
+Usage:
+    python ocpp-capacity-finder.py --url ws://localhost:3001/ocpp/CAP --slo-p99-ms 500
+    python ocpp-capacity-finder.py --url wss://staging/ocpp/CAP --ca-cert ca.pem \\
+        --start 500 --growth 2 --max-connections 20000 --json capacity.json
+
+Note:
+    All probe connections run in this process, so make sure the machine
+    running the finder is not the bottleneck (watch its CPU) when testing
+    large fleets.
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from ocpp_runtime import build_ssl_context, load_tool
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+probe = load_tool('test-ocpp-connection.py', 'ocpp_connection_probe')
+
+
+def raise_open_file_limit():
+    """Allow one socket per probe connection"""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def measure_step(args, connections, interval, ssl_context):
+    """Run one load level and return its measurements"""
+    snapshot = await probe.run_probe(
+        args.url, connections, interval,
+        duration=args.warmup + args.step_duration,
+        timeout=args.timeout,
+        ssl_context=ssl_context,
+        warmup=args.warmup,
+    )
+    total = snapshot['total']
+    failures = total['timeouts'] + total['errors']
+    error_rate = failures / total['sent'] if total['sent'] else 1.0
+    step = {
+        'connections': connections,
+        'interval_s': round(interval, 4),
+        'offered_rate': round(connections / interval, 1),
+        'achieved_rate': round(total['received'] / args.step_duration, 1),
+        'p50_ms': total['rtt_ms']['p50'],
+        'p99_ms': total['rtt_ms']['p99'],
+        'max_ms': total['rtt_ms']['max'],
+        'error_rate': round(error_rate, 4),
+        'sent': total['sent'],
+        'timeouts': total['timeouts'],
+        'errors': total['errors'],
+        'reconnects': total['reconnects'],
+    }
+    step['passed'] = (
+        total['received'] > 0
+        and step['p99_ms'] <= args.slo_p99_ms
+        and step['error_rate'] <= args.slo_error_rate
+    )
+    return step
+
+
+def print_step(step):
+    status = "✓ PASS" if step['passed'] else "✗ FAIL"
+    print(f"{step['connections']:>7} {step['interval_s']:>8.3f} {step['offered_rate']:>10.1f} "
+          f"{step['achieved_rate']:>10.1f} {step['p50_ms']:>8.1f} {step['p99_ms']:>8.1f} "
+          f"{step['error_rate'] * 100:>7.2f}%  {status}")
+
+
+def next_level(args, connections, interval):
+    """Load level of the next ramp step, or None when the load cannot be raised any further"""
+    if args.growth > 1:
+        grown = max(connections + 1, int(connections * args.growth))
+    else:
+        grown = connections + args.step
+    grown = min(grown, args.max_connections)
+    if args.rate_factor > 1 and interval / args.rate_factor >= args.min_interval:
+        interval /= args.rate_factor
+    elif grown == connections:
+        return None
+    return grown, interval
+
+
+def validate_args(parser, args):
+    """Reject ramp settings that would never raise the load (or make no sense)"""
+    if args.start < 1:
+        parser.error("--start must be at least 1")
+    if args.max_connections < args.start:
+        parser.error("--max-connections must be at least --start")
+    if args.growth < 1:
+        parser.error("--growth must be at least 1 (1 = grow by --step)")
+    if args.growth == 1 and args.step < 1:
+        parser.error("--step must be at least 1")
+    if args.rate_factor < 1:
+        parser.error("--rate-factor must be at least 1 (1 = constant interval)")
+    if args.interval <= 0 or args.min_interval <= 0:
+        parser.error("--interval and --min-interval must be positive")
+    if args.step_duration <= 0 or args.timeout <= 0:
+        parser.error("--step-duration and --timeout must be positive")
+    if args.warmup < 0 or args.cooldown < 0 or args.refine < 0:
+        parser.error("--warmup, --cooldown and --refine must not be negative")
+
+
+async def find_capacity(args, ssl_context):
+    """Ramp until the SLO breaks, then bisect between the last good and first bad level"""
+    curve = []
+    best = None
+    worst = None
+    connections, interval = args.start, args.interval
+
+    print(f"{'CONNS':>7} {'INTERVAL':>8} {'OFFERED/s':>10} {'ACHIEVED/s':>10} {'P50 ms':>8} {'P99 ms':>8} {'ERRORS':>8}")
+    print('-' * 72)
+
+    while True:
+        step = await measure_step(args, connections, interval, ssl_context)
+        curve.append(step)
+        print_step(step)
+        if not step['passed']:
+            worst = step
+            break
+        best = step
+        level = next_level(args, connections, interval)
+        if level is None:
+            break
+        connections, interval = level
+        await asyncio.sleep(args.cooldown)
+
+    # Bisect on connections (at the failing step's interval) to tighten the bound
+    if worst is not None and best is not None:
+        low, high = best['connections'], worst['connections']
+        interval = worst['interval_s']
+        for _ in range(args.refine):
+            if high - low <= max(1, low // 100):
+                break
+            await asyncio.sleep(args.cooldown)
+            middle = (low + high) // 2
+            step = await measure_step(args, middle, interval, ssl_context)
+            step['refine'] = True
+            curve.append(step)
+            print_step(step)
+            if step['passed']:
+                low = middle
+                if step['offered_rate'] > best['offered_rate']:
+                    best = step
+            else:
+                high = middle
+
+    return best, worst, curve
+
+
+async def main():
+    """Run the capacity search"""
+    parser = argparse.ArgumentParser(description='Find the highest OCPP load that meets a latency SLO')
+    parser.add_argument('--url', default='ws://localhost:3001/ocpp/CAP',
+                        help='Charger WebSocket URL (connection IDs are appended)')
+    parser.add_argument('--start', type=int, default=100, help='Connections in the first step')
+    parser.add_argument('--step', type=int, default=100, help='Connections added per step')
+    parser.add_argument('--growth', type=float, default=1.0,
+                        help='Multiply connections by this factor per step instead of adding --step')
+    parser.add_argument('--max-connections', type=int, default=10000, help='Stop ramping at this many connections')
+    parser.add_argument('--interval', type=float, default=10.0, help='Heartbeat interval per connection in the first step')
+    parser.add_argument('--rate-factor', type=float, default=1.0,
+                        help='Divide the Heartbeat interval by this factor per step (raises message rate)')
+    parser.add_argument('--min-interval', type=float, default=0.05,
+                        help='Stop raising the rate (--rate-factor) below this Heartbeat interval in seconds')
+    parser.add_argument('--warmup', type=float, default=10.0, help='Seconds per step before measuring')
+    parser.add_argument('--step-duration', type=float, default=30.0, help='Measured seconds per step')
+    parser.add_argument('--cooldown', type=float, default=2.0, help='Pause between steps in seconds')
+    parser.add_argument('--refine', type=int, default=3, help='Bisection steps after the SLO breaks')
+    parser.add_argument('--timeout', type=float, default=5.0, help='Heartbeat response timeout in seconds')
+    parser.add_argument('--slo-p99-ms', type=float, default=500.0, help='SLO: p99 Heartbeat RTT in ms')
+    parser.add_argument('--slo-error-rate', type=float, default=0.01, help='SLO: max (timeouts + errors) / sent')
+    parser.add_argument('--ca-cert', help='CA certificate (PEM) for wss://')
+    parser.add_argument('--client-cert', help='Client certificate (PEM) for wss://')
+    parser.add_argument('--client-key', help='Client private key (PEM) for wss://')
+    parser.add_argument('--insecure', action='store_true', help='Skip TLS certificate verification')
+    parser.add_argument('--json', metavar='FILE', help='Write the result and the full curve as JSON')
+    args = parser.parse_args()
+    validate_args(parser, args)
+
+    raise_open_file_limit()
+
+    ssl_context = None
+    if args.url.startswith('wss://'):
+        ssl_context = build_ssl_context(args.ca_cert, args.client_cert, args.client_key, args.insecure)
+
+    print("=" * 72)
+    print(" OCPP Capacity Finder")
+    print("=" * 72)
+    print(f" Target: {args.url}")
+    print(f" SLO: p99 Heartbeat RTT <= {args.slo_p99_ms} ms, error rate <= {args.slo_error_rate * 100:.2f}%")
+    print("=" * 72)
+
+    best, worst, curve = await find_capacity(args, ssl_context)
+
+    print("=" * 72)
+    if best:
+        print(f" ✓ Highest sustainable level: {best['connections']} chargers, "
+              f"{best['offered_rate']} msg/s (p99 {best['p99_ms']} ms)")
+    else:
+        print(" ✗ SLO violated at the first step - lower --start or --interval")
+    if worst:
+        print(f"   First failing level: {worst['connections']} chargers, {worst['offered_rate']} msg/s "
+              f"(p99 {worst['p99_ms']} ms, errors {worst['error_rate'] * 100:.2f}%)")
+    else:
+        print(f"   SLO never violated up to --max-connections {args.max_connections}"
+              + (f" and --min-interval {args.min_interval}s" if args.rate_factor > 1 else ""))
+    print("=" * 72)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'url': args.url,
+                'slo': {'p99_ms': args.slo_p99_ms, 'error_rate': args.slo_error_rate},
+                'best': best,
+                'first_failure': worst,
+                'curve': curve,
+            }, f, indent=2)
+        print(f" Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -17,23 +17,60 @@ Features:
     - Start/Stop Transaction
     - Meter Values
     - Responds to Remote Start/Stop commands
+    - Local authorization list (SendLocalList / GetLocalListVersion)
+    - Authorization cache (ClearCache)
+    - Offline queue for transaction messages, flushed in order after reconnect
+      (python ocpp-simulator.py --autostart --reconnect-delay 10 --flush-rate 5)
+    - Fleet mode: --count N chargers sharing one process and one SSLContext
+    - wss:// with CA / client certificates (OCPP Security Profile 2/3) and
+      TLS session resumption on reconnect; handshake time is reported
+      separately from BootNotification time
+      (python ocpp-simulator.py --url wss://localhost:3443/ocpp --ca-cert certs/server.pem)
+    - Configurable permessage-deflate (--compression, --deflate-*) with
+      wire vs payload byte counters and compression ratio per charger
+      (python ocpp-simulator.py --count 500 --compression off --stats-file off.json)
+    - --profile cprofile|yappi|tracemalloc: CPU profile per OCPP action,
+      event-loop lag and allocation snapshots, written on exit and on SIGUSR1
+      (python ocpp-simulator.py --count 500 --profile yappi --duration 60)
 """
 
 import asyncio
+import contextvars
 import websockets
 import argparse
+import dataclasses
+import json
 import logging
-from datetime import datetime
+import os
+import ssl
+import tempfile
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from contextlib import nullcontext
+from datetime import datetime, timezone
 from ocpp.v16 import ChargePoint as cp
 from ocpp.v16 import call, call_result
 from ocpp.v16.enums import (
     Action,
+    AuthorizationStatus,
     ChargePointStatus,
+    ClearCacheStatus,
     RegistrationStatus,
     RemoteStartStopStatus,
+    UpdateStatus,
+    UpdateType,
 )
 from ocpp.routing import on
 
+from ocpp_bandwidth import (
+    BandwidthTotals,
+    add_compression_arguments,
+    client_connect_options,
+    describe_compression,
+    format_counters,
+)
+from ocpp_runtime import build_ssl_context, resource_usage
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -42,15 +79,459 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def id_tag_info_valid(id_tag_info):
+    """Check whether an idTagInfo (snake_case keys) authorizes charging now"""
+    if id_tag_info.get('status') != AuthorizationStatus.accepted:
+        return False
+    expiry_date = id_tag_info.get('expiry_date')
+    if expiry_date:
+        expiry = datetime.fromisoformat(expiry_date.replace('Z', '+00:00'))
+        if expiry.tzinfo is None:
+            expiry = expiry.replace(tzinfo=timezone.utc)
+        return expiry > datetime.now(timezone.utc)
+    return True
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of numbers (nearest rank)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def histogram_percentile(histogram, pct):
+    """Return the pct-th percentile (nearest rank) of a {value: count} histogram"""
+    total = sum(histogram.values())
+    if not total:
+        return 0.0
+    rank = max(1, min(total, int(round(pct / 100 * total))))
+    seen = 0
+    for value, count in sorted(histogram.items()):
+        seen += count
+        if seen >= rank:
+            return value
+
+
+class CallStats:
+    """Round-trip times of outgoing calls per OCPP action, shared by the whole fleet.
+    
+    RTTs are kept in 0.1 ms histogram buckets, so memory stays constant
+    however long the fleet runs. One histogram covers the whole run, the
+    other starts with start_steady() (once every charger has booted), so
+    the ramp does not dilute the steady-state rates.
+    """
+    
+    BUCKET_MS = 0.1
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steady_since = None
+        self.total = defaultdict(Counter)  # action -> {RTT bucket: count}
+        self.steady = defaultdict(Counter)
+        self.failures = Counter()
+    
+    def start_steady(self):
+        """Start the steady-state window"""
+        if self.steady_since is None:
+            self.steady_since = time.perf_counter()
+    
+    def record(self, action, started):
+        bucket = round((time.perf_counter() - started) * 1000 / self.BUCKET_MS)
+        self.total[action][bucket] += 1
+        if self.steady_since is not None:
+            self.steady[action][bucket] += 1
+    
+    def record_failure(self, action):
+        self.failures[action] += 1
+    
+    def summary(self, until):
+        """Per-action count, rate (calls/s) and RTT percentiles of the steady state (whole run if never reached)"""
+        since = self.steady_since if self.steady_since is not None else self.started
+        histograms = self.steady if self.steady_since is not None else self.total
+        window = until - since
+        summary = {}
+        for action in sorted(set(self.total) | set(self.failures)):
+            histogram = histograms.get(action, {})
+            count = sum(histogram.values())
+            summary[action] = {
+                'count': count,
+                'rate': round(count / window, 2) if window > 0 else None,
+                'p50_ms': round(histogram_percentile(histogram, 50) * self.BUCKET_MS, 2),
+                'p99_ms': round(histogram_percentile(histogram, 99) * self.BUCKET_MS, 2),
+                'failures': self.failures[action],
+            }
+        return summary
+
+
+# ==================== TLS ====================
+
+# Key under which the current charger's TLS session is cached (set per charger task)
+tls_session_key = contextvars.ContextVar('tls_session_key', default=None)
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """Client SSLContext shared by the whole fleet that resumes TLS sessions.
+    
+    asyncio gives no way to pass a session to a new connection, so the
+    session saved for the current charger (see tls_session_key) is injected
+    when asyncio wraps the socket.
+    """
+    
+    def __init__(self, protocol=ssl.PROTOCOL_TLS_CLIENT):
+        # SSLContext takes the protocol in __new__, not __init__
+        super().__init__()
+        self.sessions = {}
+    
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        if session is None and not server_side:
+            session = self.sessions.get(tls_session_key.get())
+        return super().wrap_bio(incoming, outgoing, server_side, server_hostname, session)
+    
+    def save_session(self, ssl_object):
+        """Remember the current charger's session so the next connect can resume it"""
+        key = tls_session_key.get()
+        if key is not None and ssl_object.session is not None and ssl_object.session.has_ticket:
+            self.sessions[key] = ssl_object.session
+
+
+class LocalAuthList:
+    """Local Authorization List managed by the Central System via SendLocalList"""
+    
+    def __init__(self, max_length=10000):
+        self.version = 0
+        self.max_length = max_length
+        self.entries = {}
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def get(self, id_tag):
+        return self.entries.get(id_tag)
+    
+    def update(self, list_version, update_type, local_authorization_list):
+        """Apply a full or differential update, returning an UpdateStatus"""
+        if update_type == UpdateType.full:
+            entries = {}
+        elif list_version <= self.version:
+            return UpdateStatus.version_mismatch
+        else:
+            entries = dict(self.entries)
+        
+        for item in local_authorization_list:
+            id_tag_info = item.get('id_tag_info')
+            if id_tag_info is None:
+                entries.pop(item['id_tag'], None)  # Differential removal
+            else:
+                entries[item['id_tag']] = id_tag_info
+        
+        if len(entries) > self.max_length:
+            return UpdateStatus.failed
+        
+        self.entries = entries
+        self.version = list_version
+        return UpdateStatus.accepted
+
+
+class AuthorizationCache:
+    """Bounded LRU cache of idTagInfo received from the Central System"""
+    
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def get(self, id_tag):
+        id_tag_info = self.entries.get(id_tag)
+        if id_tag_info is not None:
+            self.entries.move_to_end(id_tag)
+        return id_tag_info
+    
+    def put(self, id_tag, id_tag_info):
+        if self.max_size <= 0:
+            return
+        self.entries[id_tag] = id_tag_info
+        self.entries.move_to_end(id_tag)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+    
+    def discard(self, id_tag):
+        self.entries.pop(id_tag, None)
+    
+    def clear(self):
+        self.entries.clear()
+
+
+class OfflineQueue:
+    """FIFO of transaction-related messages kept while the Central System is unreachable.
+
+    At most max_memory messages are held in memory. Once that is full, new
+    messages are appended to a spill file (JSON lines) and read back in
+    order as the in-memory part drains, so memory stays bounded however
+    long the outage lasts.
+    
+    The queue does not survive a restart: the older messages only exist in
+    memory and local transaction IDs start over, so a spill file left by a
+    previous run is moved aside (<spill file>.previous) rather than replayed.
+    """
+    
+    def __init__(self, spill_path, max_memory=1000):
+        self.spill_path = spill_path
+        self.max_memory = max_memory
+        self.memory = deque()
+        self.spilled = 0
+        self.spill_offset = 0
+        self._spill_file = None
+        
+        if os.path.exists(spill_path):
+            os.replace(spill_path, spill_path + '.previous')
+            logger.warning(f"Moved offline queue spill file of a previous run to {spill_path}.previous (not replayed)")
+    
+    def __len__(self):
+        return len(self.memory) + self.spilled
+    
+    def put(self, message):
+        # Once anything has spilled, later messages must follow it to keep order
+        if self.spilled or len(self.memory) >= self.max_memory:
+            if self._spill_file is None:
+                self._spill_file = open(self.spill_path, 'a', encoding='utf-8')
+            self._spill_file.write(json.dumps(message) + '\n')
+            self._spill_file.flush()
+            self.spilled += 1
+        else:
+            self.memory.append(message)
+    
+    def peek(self):
+        """Return the oldest message without removing it (None if empty)"""
+        if not self.memory and self.spilled:
+            self._refill()
+        return self.memory[0] if self.memory else None
+    
+    def pop(self):
+        """Remove the oldest message once it has been delivered"""
+        self.memory.popleft()
+    
+    def _refill(self):
+        """Move the next batch of spilled messages back into memory"""
+        with open(self.spill_path, encoding='utf-8') as f:
+            f.seek(self.spill_offset)
+            while len(self.memory) < self.max_memory and self.spilled:
+                line = f.readline()
+                if not line:
+                    break
+                self.memory.append(json.loads(line))
+                self.spilled -= 1
+            self.spill_offset = f.tell()
+        
+        if not self.spilled:
+            # Spill file fully drained - start over with an empty file
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+            os.remove(self.spill_path)
+            self.spill_offset = 0
+
+
+# Returned by send_transaction_message when the message was queued offline
+QUEUED = object()
+
+# ocpp_profiling.Profiler when running with --profile
+profiler = None
+
+
 class ChargePointSimulator(cp):
     """OCPP 1.6 Charge Point Simulator"""
     
-    def __init__(self, id, connection, response_timeout=30):
+    def __init__(self, id, connection, response_timeout=30, auth_cache_size=1000,
+                 local_list_max_length=10000, offline_queue=None, call_stats=None):
         super().__init__(id, connection, response_timeout)
         self.transaction_id = None
         self.current_status = ChargePointStatus.available
         self.meter_value = 0.0
         self.id_tag = None
+        self.local_auth_list = LocalAuthList(local_list_max_length)
+        self.auth_cache = AuthorizationCache(auth_cache_size)
+        self.auth_stats = Counter()
+        self.online = False
+        self.booted = asyncio.Event()  # Set while a connection is up and BootNotification was answered
+        if offline_queue is None:
+            offline_queue = OfflineQueue(os.path.join(tempfile.gettempdir(), f"ocpp-offline-{id}.jsonl"))
+        self.offline_queue = offline_queue
+        self.transaction_id_map = {}
+        self._local_transaction_counter = 0
+        self.connection_timings = []
+        self.call_stats = call_stats  # None = RTTs are not recorded (no --stats-file)
+        self.bandwidth = BandwidthTotals()
+        self.open_connection = None
+    
+    async def call(self, payload, *args, **kwargs):
+        """Send a call, recording its round-trip time per action"""
+        action = payload.__class__.__name__
+        started = time.perf_counter()
+        try:
+            with profiler.action(action, awaits=True) if profiler else nullcontext():
+                response = await super().call(payload, *args, **kwargs)
+        except Exception:
+            if self.call_stats:
+                self.call_stats.record_failure(action)
+            raise
+        if self.call_stats:
+            if response is None:
+                self.call_stats.record_failure(action)  # CALLERROR
+            else:
+                self.call_stats.record(action, started)
+        return response
+    
+    async def _handle_call(self, msg):
+        """Run the handler for a call from the Central System (attributed per action when profiling)"""
+        with profiler.action(msg.action, awaits=True) if profiler else nullcontext():
+            return await super()._handle_call(msg)
+    
+    # ==================== Connection Lifecycle ====================
+    
+    async def run_connection(self, connection, flush_rate=0, connect_time=None):
+        """Run the OCPP session on a (re)established connection until it closes"""
+        self._connection = connection
+        self.open_connection = connection
+        receiver = asyncio.ensure_future(self.start())
+        tasks = [receiver]
+        
+        ssl_object = connection.transport.get_extra_info('ssl_object')
+        timing = {
+            'connect_ms': connect_time * 1000 if connect_time is not None else None,
+            'tls_ms': None,
+            'tls_resumed': None,
+            'boot_ms': None,
+            'booted_at': None,
+        }
+        if ssl_object is not None:
+            timing['tls_ms'] = (ssl_object.handshake_time or 0) * 1000
+            timing['tls_resumed'] = ssl_object.session_reused
+            logger.info(f"🔒 TLS {ssl_object.version()} handshake: {timing['tls_ms']:.1f} ms"
+                        f"{' (resumed)' if ssl_object.session_reused else ''}")
+        self.connection_timings.append(timing)
+        
+        try:
+            # Send Boot Notification
+            boot_started = time.perf_counter()
+            heartbeat_interval = await self.send_boot_notification()
+            timing['boot_ms'] = (time.perf_counter() - boot_started) * 1000
+            if heartbeat_interval is not None:
+                timing['booted_at'] = time.perf_counter()
+            logger.info(f"  Connect: {timing['connect_ms'] or 0:.1f} ms, Boot: {timing['boot_ms']:.1f} ms")
+            
+            # The session ticket has arrived by now (TLS 1.3 sends it after the handshake)
+            if ssl_object is not None and isinstance(ssl_object.context, ResumingSSLContext):
+                ssl_object.context.save_session(ssl_object)
+            
+            if heartbeat_interval is None:
+                heartbeat_interval = 30
+            
+            self.online = True
+            self.booted.set()
+            
+            # Send initial status
+            await self.send_status_notification()
+            
+            tasks.append(asyncio.ensure_future(self.send_heartbeat(heartbeat_interval)))
+            if self.offline_queue:
+                tasks.append(asyncio.ensure_future(self.flush_offline_queue(flush_rate)))
+            
+            await receiver
+        except websockets.exceptions.ConnectionClosed as e:
+            logger.warning(f"✗ Connection lost: {e}")
+        finally:
+            self.online = False
+            self.booted.clear()
+            for task in tasks:
+                task.cancel()
+            self.open_connection = None
+            self.bandwidth.add(connection)
+            if hasattr(connection, 'counters'):
+                logger.info(f"  Bytes {format_counters(connection.counters())}")
+    
+    def bandwidth_totals(self):
+        """Byte counters over all connections so far, including the open one"""
+        totals = BandwidthTotals()
+        totals.merge(self.bandwidth)
+        if self.open_connection is not None:
+            totals.add(self.open_connection)
+        return totals
+    
+    async def send_transaction_message(self, request, local_transaction_id=None):
+        """Send a transaction-related message, queueing it while offline"""
+        # Anything still queued must be delivered first to keep messages in order
+        if self.online and not self.offline_queue:
+            try:
+                return await self.call(request)
+            except websockets.exceptions.ConnectionClosed:
+                self.online = False
+            except asyncio.TimeoutError:
+                # Without pings a half-open link only shows up as a missing answer: queue the
+                # message (the Central System may see it twice) and reconnect to flush the queue
+                logger.warning(f"{request.__class__.__name__} timed out - dropping the connection")
+                self.online = False
+                if self.open_connection is not None:
+                    asyncio.ensure_future(self.open_connection.close())
+        
+        self.offline_queue.put({
+            'action': request.__class__.__name__,
+            'payload': dataclasses.asdict(request),
+            'local_transaction_id': local_transaction_id,
+        })
+        if self.online:
+            logger.info(f"⏳ Queued {request.__class__.__name__} behind the offline backlog being flushed "
+                        f"({len(self.offline_queue)} queued)")
+        else:
+            logger.warning(f"⏸ Offline - queued {request.__class__.__name__} ({len(self.offline_queue)} queued)")
+        return QUEUED
+    
+    async def flush_offline_queue(self, rate=0):
+        """Deliver queued messages in order, at most `rate` messages per second (0 = unlimited)"""
+        logger.info(f"Flushing offline queue ({len(self.offline_queue)} messages)...")
+        delivered = 0
+        
+        while self.online:
+            message = self.offline_queue.peek()
+            if message is None:
+                break
+            
+            payload = message['payload']
+            transaction_id = payload.get('transaction_id')
+            if transaction_id in self.transaction_id_map:
+                payload['transaction_id'] = self.transaction_id_map[transaction_id]
+            
+            try:
+                response = await self.call(getattr(call, message['action'])(**payload))
+            except websockets.exceptions.ConnectionClosed:
+                self.online = False
+                break
+            except asyncio.TimeoutError as e:
+                logger.error(f"Offline queue flush timed out, retrying: {e}")
+                continue
+            
+            if response is None:
+                logger.warning(f"{message['action']} rejected by Central System - dropped")
+            elif message['action'] == 'StartTransaction':
+                self.map_local_transaction(message['local_transaction_id'], response.transaction_id)
+            
+            self.offline_queue.pop()
+            delivered += 1
+            
+            if rate > 0:
+                await asyncio.sleep(1 / rate)
+        
+        logger.info(f"✓ Offline queue flushed - {delivered} delivered, {len(self.offline_queue)} remaining")
+    
+    def map_local_transaction(self, local_transaction_id, transaction_id):
+        """Replace a locally assigned transaction ID once the Central System assigns one"""
+        self.transaction_id_map[local_transaction_id] = transaction_id
+        if self.transaction_id == local_transaction_id:
+            self.transaction_id = transaction_id
+        logger.info(f"  Transaction {local_transaction_id} → {transaction_id}")
         
     # ==================== Outgoing Messages ====================
     
@@ -110,14 +591,51 @@ class ChargePointSimulator(cp):
         except Exception as e:
             logger.error(f"Status Notification failed: {e}")
     
+    def authorize_locally(self, id_tag):
+        """Authorize from the local list or cache; returns (source, accepted) or None to ask the Central System.
+        
+        The local list takes precedence over the cache (OCPP 1.6 3.5): a tag
+        on the list gets the list's answer, whatever the cache says.
+        """
+        id_tag_info = self.local_auth_list.get(id_tag)
+        if id_tag_info is not None:
+            return 'local list', id_tag_info_valid(id_tag_info)
+        id_tag_info = self.auth_cache.get(id_tag)
+        if id_tag_info is not None and id_tag_info_valid(id_tag_info):
+            return 'cache', True
+        return None
+    
+    def cache_id_tag_info(self, id_tag, id_tag_info):
+        """Cache a Central System answer (tags on the local list are never cached)"""
+        if self.local_auth_list.get(id_tag) is None:
+            self.auth_cache.put(id_tag, id_tag_info)
+    
     async def send_authorize(self, id_tag):
-        """Send Authorization request"""
+        """Authorize an ID tag locally if possible, otherwise ask the Central System"""
         logger.info(f"Authorizing ID Tag: {id_tag}")
+        started = time.perf_counter()
+        
+        local = self.authorize_locally(id_tag)
+        if local:
+            source, accepted = local
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.auth_stats[source] += 1
+            logger.info(f"{'✓' if accepted else '✗'} Authorization: {'Accepted' if accepted else 'Rejected'} "
+                        f"({source}, {elapsed_ms:.3f} ms)")
+            return accepted
+        
+        if not self.online:
+            logger.warning(f"✗ Authorization: offline and {id_tag} not in local list or cache")
+            return False
+        
         request = call.Authorize(id_tag=id_tag)
         
         try:
             response = await self.call(request)
-            logger.info(f"✓ Authorization: {response.id_tag_info['status']}")
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.auth_stats['server'] += 1
+            self.cache_id_tag_info(id_tag, response.id_tag_info)
+            logger.info(f"✓ Authorization: {response.id_tag_info['status']} (server, {elapsed_ms:.1f} ms)")
             return response.id_tag_info['status'] == 'Accepted'
         except Exception as e:
             logger.error(f"Authorization failed: {e}")
@@ -140,9 +658,17 @@ class ChargePointSimulator(cp):
             timestamp=datetime.utcnow().isoformat(),
         )
         
+        # Negative IDs mark transactions started offline until the server assigns one
+        self._local_transaction_counter -= 1
+        local_transaction_id = self._local_transaction_counter
+        
         try:
-            response = await self.call(request)
-            self.transaction_id = response.transaction_id
+            response = await self.send_transaction_message(request, local_transaction_id)
+            if response is QUEUED:
+                self.transaction_id = local_transaction_id
+            else:
+                self.cache_id_tag_info(id_tag, response.id_tag_info)
+                self.transaction_id = response.transaction_id
             self.id_tag = id_tag
             self.current_status = ChargePointStatus.charging
             
@@ -176,7 +702,7 @@ class ChargePointSimulator(cp):
         )
         
         try:
-            response = await self.call(request)
+            response = await self.send_transaction_message(request)
             logger.info(f"✓ Transaction Stopped - Total Energy: {self.meter_value} Wh")
             
             # Update status to available
@@ -189,16 +715,16 @@ class ChargePointSimulator(cp):
         except Exception as e:
             logger.error(f"Stop Transaction failed: {e}")
     
-    async def send_meter_values(self):
+    async def send_meter_values(self, interval=60):
         """Send periodic meter values during charging"""
-        logger.info("Starting Meter Values reporting...")
+        logger.info(f"Starting Meter Values reporting (every {interval}s)...")
         
         while True:
-            await asyncio.sleep(60)  # Every 60 seconds
+            await asyncio.sleep(interval)
             
             if self.transaction_id and self.current_status == ChargePointStatus.charging:
                 # Simulate energy consumption (7.4 kW charging)
-                self.meter_value += 7400  # Wh per minute
+                self.meter_value += 7400 * interval / 60  # 7400 Wh per minute
                 
                 request = call.MeterValues(
                     connector_id=1,
@@ -214,7 +740,7 @@ class ChargePointSimulator(cp):
                 )
                 
                 try:
-                    response = await self.call(request)
+                    response = await self.send_transaction_message(request)
                     logger.info(f"⚡ Meter Value: {self.meter_value} Wh")
                 except Exception as e:
                     logger.error(f"Meter Values failed: {e}")
@@ -296,6 +822,14 @@ class ChargePointSimulator(cp):
                 {"key": "HeartbeatInterval", "readonly": False, "value": "30"},
                 {"key": "MeterValueSampleInterval", "readonly": False, "value": "60"},
                 {"key": "NumberOfConnectors", "readonly": True, "value": "1"},
+                {"key": "LocalAuthListEnabled", "readonly": True, "value": "true"},
+                {"key": "LocalAuthListMaxLength", "readonly": True,
+                 "value": str(self.local_auth_list.max_length)},
+                {"key": "SendLocalListMaxLength", "readonly": True,
+                 "value": str(self.local_auth_list.max_length)},
+                {"key": "AuthorizationCacheEnabled", "readonly": True,
+                 "value": "true" if self.auth_cache.max_size > 0 else "false"},
+                {"key": "LocalPreAuthorize", "readonly": True, "value": "true"},
             ]
         }
         
@@ -307,71 +841,290 @@ class ChargePointSimulator(cp):
         logger.info(f"📥 Change Configuration - {key}={value}")
         
         return call_result.ChangeConfiguration(status="Accepted")
+    
+    @on('SendLocalList')
+    async def on_send_local_list(self, list_version, update_type, local_authorization_list=None, **kwargs):
+        """Handle Send Local List command"""
+        entries = local_authorization_list or []
+        logger.info(f"📥 Send Local List - Version: {list_version}, Type: {update_type}, Entries: {len(entries)}")
+        
+        status = self.local_auth_list.update(list_version, update_type, entries)
+        if status == UpdateStatus.accepted:
+            # Tags on the local list are answered from it and must not be cached
+            for item in entries:
+                if item.get('id_tag_info') is not None:
+                    self.auth_cache.discard(item['id_tag'])
+        logger.info(f"  Local list {status} ({len(self.local_auth_list)} tags, version {self.local_auth_list.version})")
+        
+        return call_result.SendLocalList(status=status)
+    
+    @on('GetLocalListVersion')
+    async def on_get_local_list_version(self, **kwargs):
+        """Handle Get Local List Version command"""
+        logger.info(f"📥 Get Local List Version - Version: {self.local_auth_list.version}")
+        
+        return call_result.GetLocalListVersion(list_version=self.local_auth_list.version)
+    
+    @on('ClearCache')
+    async def on_clear_cache(self, **kwargs):
+        """Handle Clear Cache command"""
+        logger.info(f"📥 Clear Cache - {len(self.auth_cache)} entries")
+        
+        self.auth_cache.clear()
+        return call_result.ClearCache(status=ClearCacheStatus.accepted)
+
+
+async def run_charger(args, charge_point, url, ssl_context=None):
+    """Keep one simulated charger connected (reconnecting if configured)"""
+    charge_point_id = charge_point.id
+    tls_session_key.set(charge_point_id)
+    
+    # Meter values keep accumulating (and queueing) while disconnected
+    meter_task = asyncio.ensure_future(charge_point.send_meter_values(args.meter_interval))
+    
+    async def autostart():
+        # Start 5 s after boot; if the connection drops before that, try again after the next boot
+        while True:
+            await charge_point.booted.wait()
+            await asyncio.sleep(5)
+            if await charge_point.send_authorize(args.id_tag):
+                await charge_point.send_start_transaction(id_tag=args.id_tag)
+                return
+            if charge_point.online:
+                return  # Tag rejected - retrying would not change the answer
+    
+    # Auto-start transaction if requested
+    autostart_task = asyncio.ensure_future(autostart()) if args.autostart else None
+    
+    connect_kwargs = client_connect_options(args)
+    if url.startswith('wss://'):
+        connect_kwargs['ssl'] = ssl_context
+    
+    try:
+        while True:
+            try:
+                connect_started = time.perf_counter()
+                async with websockets.connect(
+                    url,
+                    subprotocols=['ocpp1.6'],
+                    ping_interval=None,  # Disable ping/pong
+                    close_timeout=10,
+                    **connect_kwargs
+                ) as ws:
+                    await charge_point.run_connection(
+                        ws, args.flush_rate, connect_time=time.perf_counter() - connect_started
+                    )
+            except ConnectionRefusedError:
+                logger.error("❌ Connection refused. Is the OCPP server running?")
+                logger.info("💡 Make sure your server is running at: ws://localhost:3001/ocpp")
+                logger.info("💡 Start your dev server with: npm run dev")
+            except ssl.SSLError as e:
+                logger.error(f"❌ TLS handshake failed: {e}")
+                logger.info("💡 Check --ca-cert / --client-cert / --client-key")
+            except websockets.exceptions.InvalidStatusCode as e:
+                logger.error(f"❌ Invalid status code: {e.status_code}")
+                logger.info("💡 Check if the WebSocket endpoint is correct")
+            except websockets.exceptions.WebSocketException as e:
+                logger.error(f"WebSocket connection failed: {e}")
+            except OSError as e:
+                logger.error(f"Connection failed: {e}")
+            
+            if args.reconnect_delay <= 0:
+                break
+            logger.info(f"Reconnecting in {args.reconnect_delay}s ({len(charge_point.offline_queue)} messages queued)...")
+            await asyncio.sleep(args.reconnect_delay)
+    finally:
+        meter_task.cancel()
+        if autostart_task:
+            autostart_task.cancel()
+
+
+def log_connection_summary(charge_points):
+    """Log TLS handshake and boot time percentiles across the fleet"""
+    timings = [timing for charge_point in charge_points for timing in charge_point.connection_timings]
+    if not timings:
+        return
+    
+    logger.info("=" * 60)
+    logger.info(f"Connections: {len(timings)} ({len(charge_points)} chargers)")
+    for key, label in (('connect_ms', 'Connect'), ('tls_ms', 'TLS handshake'), ('boot_ms', 'Boot')):
+        values = [timing[key] for timing in timings if timing[key] is not None]
+        if values:
+            logger.info(f"  {label:<14} p50 {percentile(values, 50):8.1f} ms   "
+                        f"p99 {percentile(values, 99):8.1f} ms   max {max(values):8.1f} ms")
+    resumed = [timing['tls_resumed'] for timing in timings if timing['tls_resumed'] is not None]
+    if resumed:
+        logger.info(f"  TLS resumed    {sum(resumed)}/{len(resumed)}")
+    bandwidth = fleet_bandwidth(charge_points)
+    if bandwidth.connections:
+        logger.info(f"  Bytes          {format_counters(bandwidth.summary())}")
+    logger.info("=" * 60)
+
+
+def fleet_bandwidth(charge_points):
+    """Byte counters summed over every charger"""
+    totals = BandwidthTotals()
+    for charge_point in charge_points:
+        totals.merge(charge_point.bandwidth_totals())
+    return totals
+
+
+def write_stats_file(filename, charge_points, call_stats, started, finished, cpu_start_s, rss_start_kb):
+    """Write fleet measurements (ramp time, per-action rates and RTTs, CPU, RSS) as JSON"""
+    first_boots = []
+    for charge_point in charge_points:
+        booted = [timing['booted_at'] for timing in charge_point.connection_timings if timing['booted_at']]
+        if booted:
+            first_boots.append(booted[0])
+    
+    all_booted = len(first_boots) == len(charge_points)
+    ramp_end = max(first_boots) if all_booted else None
+    cpu_seconds, rss_peak_kb = resource_usage()
+    bandwidth = fleet_bandwidth(charge_points).summary()
+    bandwidth['bytes_out_per_charger'] = round(bandwidth['bytes_out'] / len(charge_points), 1)
+    
+    stats = {
+        'chargers': len(charge_points),
+        'booted': len(first_boots),
+        'duration_s': round(finished - started, 3),
+        'ramp_s': round(ramp_end - started, 3) if ramp_end else None,
+        'steady_s': round(finished - ramp_end, 3) if ramp_end else None,
+        'actions': call_stats.summary(until=finished),
+        'bandwidth': bandwidth,
+        'cpu_s': cpu_seconds,
+        'cpu_start_s': cpu_start_s,
+        'rss_start_kb': rss_start_kb,
+        'rss_peak_kb': rss_peak_kb,
+    }
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2)
+    logger.info(f"Stats written to {filename}")
 
 
 async def main():
     """Main function to run the simulator"""
+    global profiler
+    
     parser = argparse.ArgumentParser(description='OCPP 1.6 Charge Point Simulator')
-    parser.add_argument('--id', default='TEST-CP-001', help='Charge Point ID')
+    parser.add_argument('--id', default='TEST-CP-001', help='Charge Point ID (prefix in fleet mode)')
     parser.add_argument('--url', default='ws://localhost:3001/ocpp', help='Central System WebSocket URL')
+    parser.add_argument('--count', type=int, default=1,
+                        help='Number of chargers to simulate (IDs <id>-0001..., appended to the URL)')
+    parser.add_argument('--ramp-rate', type=float, default=50, help='Fleet mode: chargers started per second')
     parser.add_argument('--autostart', action='store_true', help='Automatically start a transaction')
+    parser.add_argument('--id-tag', default='USER-001', help='ID tag used for --autostart')
+    parser.add_argument('--auth-cache-size', type=int, default=1000,
+                        help='Authorization cache entries (0 disables the cache)')
+    parser.add_argument('--local-list-max', type=int, default=10000,
+                        help='Maximum local authorization list length')
+    parser.add_argument('--meter-interval', type=float, default=60, help='Meter Values interval in seconds')
+    parser.add_argument('--reconnect-delay', type=float, default=0,
+                        help='Seconds to wait before reconnecting (0 = exit when the connection drops)')
+    parser.add_argument('--queue-size', type=int, default=1000,
+                        help='Offline messages kept in memory before spilling to disk')
+    parser.add_argument('--spill-dir', default=tempfile.gettempdir(), help='Directory for offline queue spill files')
+    parser.add_argument('--flush-rate', type=float, default=0,
+                        help='Offline queue flush rate in messages/s after reconnect (0 = unlimited)')
+    parser.add_argument('--ca-cert', help='CA certificate (PEM) used to verify a wss:// server')
+    parser.add_argument('--client-cert', help='Client certificate (PEM) for Security Profile 3')
+    parser.add_argument('--client-key', help='Client private key (PEM) for Security Profile 3')
+    parser.add_argument('--insecure', action='store_true', help='Skip TLS certificate verification')
+    add_compression_arguments(parser)
+    parser.add_argument('--log-level', default='INFO', help='Logging level (use WARNING for large fleets)')
+    parser.add_argument('--duration', type=float, default=0, help='Stop after this many seconds (0 = run forever)')
+    parser.add_argument('--stats-file', help='Write fleet measurements (JSON) here on exit')
+    parser.add_argument('--profile', choices=['cprofile', 'yappi', 'tracemalloc'],
+                        help='Profile the simulator; results are written on exit and on SIGUSR1')
+    parser.add_argument('--profile-dir', default='profiles', help='Directory for --profile output')
     args = parser.parse_args()
     
-    charge_point_id = args.id
-    url = args.url  # Don't append charger ID - it goes in BootNotification payload
+    started = time.perf_counter()
+    cpu_start_s, rss_start_kb = resource_usage()
+    
+    logging.getLogger().setLevel(args.log_level.upper())
+    
+    if args.count > 1:
+        charge_point_ids = [f"{args.id}-{i:04d}" for i in range(1, args.count + 1)]
+        urls = [f"{args.url.rstrip('/')}/{charge_point_id}" for charge_point_id in charge_point_ids]
+    else:
+        charge_point_ids = [args.id]
+        urls = [args.url]  # Don't append charger ID - it goes in BootNotification payload
+    
+    ssl_context = None
+    if args.url.startswith('wss://'):
+        ssl_context = build_ssl_context(args.ca_cert, args.client_cert, args.client_key, args.insecure,
+                                        context_class=ResumingSSLContext)
     
     logger.info("=" * 60)
     logger.info("OCPP 1.6 Charge Point Simulator")
     logger.info("=" * 60)
-    logger.info(f"Charge Point ID: {charge_point_id}")
-    logger.info(f"Central System URL: {url}")
+    logger.info(f"Charge Point ID: {charge_point_ids[0]}" + (f" (+{args.count - 1} more)" if args.count > 1 else ""))
+    logger.info(f"Central System URL: {urls[0]}")
+    if ssl_context:
+        logger.info(f"TLS: CA={args.ca_cert or 'system'}, client cert={args.client_cert or 'none'}")
+    logger.info(f"Compression: {describe_compression(args)}")
     logger.info("=" * 60)
     
+    call_stats = CallStats() if args.stats_file else None
+    charge_points = [
+        ChargePointSimulator(
+            charge_point_id,
+            None,
+            auth_cache_size=args.auth_cache_size,
+            local_list_max_length=args.local_list_max,
+            offline_queue=OfflineQueue(
+                os.path.join(args.spill_dir, f"ocpp-offline-{charge_point_id}.jsonl"),
+                max_memory=args.queue_size,
+            ),
+            call_stats=call_stats,
+        )
+        for charge_point_id in charge_point_ids
+    ]
+    
+    if args.profile:
+        from ocpp_profiling import Profiler
+        profiler = Profiler(args.profile, args.profile_dir, 'ocpp-simulator')
+        profiler.start()
+    
+    tasks = []
+    
+    async def start_steady_window():
+        await asyncio.gather(*(charge_point.booted.wait() for charge_point in charge_points))
+        call_stats.start_steady()
+    
+    steady_watcher = asyncio.ensure_future(start_steady_window()) if call_stats else None
+    
+    async def run_fleet():
+        for charge_point, url in zip(charge_points, urls):
+            tasks.append(asyncio.ensure_future(run_charger(args, charge_point, url, ssl_context)))
+            if args.count > 1:
+                await asyncio.sleep(1 / args.ramp_rate)
+        
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
     try:
-        async with websockets.connect(
-            url,
-            subprotocols=['ocpp1.6'],
-            ping_interval=None,  # Disable ping/pong
-            close_timeout=10
-        ) as ws:
-            charge_point = ChargePointSimulator(charge_point_id, ws)
-            
-            # Send Boot Notification
-            heartbeat_interval = await charge_point.send_boot_notification()
-            
-            if heartbeat_interval is None:
-                heartbeat_interval = 30
-            
-            # Send initial status
-            await charge_point.send_status_notification()
-            
-            # Start background tasks
-            tasks = [
-                asyncio.ensure_future(charge_point.start()),
-                asyncio.ensure_future(charge_point.send_heartbeat(heartbeat_interval)),
-                asyncio.ensure_future(charge_point.send_meter_values()),
-            ]
-            
-            # Auto-start transaction if requested
-            if args.autostart:
-                await asyncio.sleep(5)
-                await charge_point.send_start_transaction()
-            
-            await asyncio.gather(*tasks)
-            
-    except ConnectionRefusedError:
-        logger.error("❌ Connection refused. Is the OCPP server running?")
-        logger.info("💡 Make sure your server is running at: ws://localhost:3001/ocpp")
-        logger.info("💡 Start your dev server with: npm run dev")
-    except websockets.exceptions.InvalidStatusCode as e:
-        logger.error(f"❌ Invalid status code: {e.status_code}")
-        logger.info("💡 Check if the WebSocket endpoint is correct")
-    except websockets.exceptions.WebSocketException as e:
-        logger.error(f"WebSocket connection failed: {e}")
+        if args.duration:
+            await asyncio.wait_for(run_fleet(), args.duration)
+        else:
+            await run_fleet()
+    
+    except asyncio.TimeoutError:
+        logger.info(f"Run finished after {args.duration}s")
     except KeyboardInterrupt:
         logger.info("\nSimulator stopped by user")
     except Exception as e:
         logger.error(f"Simulator error: {e}")
+    finally:
+        finished = time.perf_counter()
+        for task in tasks + [steady_watcher]:
+            if task:
+                task.cancel()
+        log_connection_summary(charge_points)
+        if profiler:
+            profiler.stop()
+        if args.stats_file:
+            write_stats_file(args.stats_file, charge_points, call_stats, started, finished,
+                             cpu_start_s, rss_start_kb)
 
 
 if __name__ == '__main__':
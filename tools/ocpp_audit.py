@@ -0,0 +1,349 @@
+"""
+OCPP Message Audit Log
+----------------------
+Binary, indexed audit log of every OCPP frame passing through
+mock-ocpp-server.py (--audit-dir), queried with ocpp-audit.py.
+
+Layout of the audit directory:
+    segment-000001.log   Records in arrival order, rotated at --audit-segment-mb
+    segment-000001.idx   Sidecar index, written when the segment is sealed
+
+Segment file:
+    8-byte magic, then records of
+        RECORD header (timestamp, frame length, charger ID length,
+        action length, direction) + charger ID + action + frame (UTF-8)
+
+Index file:
+    INDEX_HEADER (magic, entry count, first/last timestamp), then one
+    INDEX_ENTRY (charger key, timestamp, segment offset) per record, sorted
+    by (charger key, timestamp). A charger/time-range query binary-searches
+    the mmapped index, seeks straight to the matching records and skips
+    segments whose time range does not overlap.
+
+Writes are queued from the event loop and encoded, written and indexed by a
+background thread, so the server never blocks on disk I/O. The queue is
+bounded: when the disk cannot keep up, new records are dropped (and counted)
+rather than buffered in memory without limit. A segment that was
+not sealed (server killed) is indexed on the next start, or scanned
+sequentially by queries until then.
+"""
+
+import glob
+import hashlib
+import logging
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_MAGIC = b'OCPPAUD\x01'
+INDEX_MAGIC = b'OCPPIDX\x01'
+
+# timestamp, frame length, charger ID length, action length, direction
+RECORD = struct.Struct('<dIHHB')
+# magic, entry count, first timestamp, last timestamp
+INDEX_HEADER = struct.Struct('<8sIdd')
+# charger key, timestamp, record offset in the segment
+INDEX_ENTRY = struct.Struct('<QdQ')
+
+DIRECTIONS = ('in', 'out')
+SEGMENT_PATTERN = re.compile(r'segment-(\d+)\.log$')
+
+
+def charger_key(charger_id):
+    """64-bit key of a charger ID used to sort and search the index"""
+    return int.from_bytes(hashlib.blake2b(charger_id.encode(), digest_size=8).digest(), 'little')
+
+
+def segment_path(directory, sequence):
+    return os.path.join(directory, f"segment-{sequence:06d}.log")
+
+
+def index_path(segment):
+    return segment[:-len('.log')] + '.idx'
+
+
+def list_segments(directory):
+    """Segment files in a directory, oldest first"""
+    segments = []
+    for path in glob.glob(os.path.join(directory, 'segment-*.log')):
+        match = SEGMENT_PATTERN.search(path)
+        if match:
+            segments.append((int(match.group(1)), path))
+    return [path for _, path in sorted(segments)]
+
+
+def encode_record(timestamp, charger_id, direction, action, frame):
+    """Serialize one frame as a segment record"""
+    charger = charger_id.encode()
+    action = (action or '').encode()
+    if isinstance(frame, str):
+        frame = frame.encode()
+    return b''.join((
+        RECORD.pack(timestamp, len(frame), len(charger), len(action), DIRECTIONS.index(direction)),
+        charger, action, frame,
+    ))
+
+
+def decode_record(buffer, offset):
+    """Decode the record at offset; returns (record dict, next offset) or (None, offset) if truncated"""
+    if offset + RECORD.size > len(buffer):
+        return None, offset
+    timestamp, frame_length, charger_length, action_length, direction = RECORD.unpack_from(buffer, offset)
+    start = offset + RECORD.size
+    end = start + charger_length + action_length + frame_length
+    if end > len(buffer):
+        return None, offset  # Partially written record at the end of an unsealed segment
+    charger_end = start + charger_length
+    action_end = charger_end + action_length
+    return {
+        'timestamp': timestamp,
+        'charger_id': bytes(buffer[start:charger_end]).decode(),
+        'direction': DIRECTIONS[direction],
+        'action': bytes(buffer[charger_end:action_end]).decode() or None,
+        'frame': bytes(buffer[action_end:end]).decode(errors='replace'),
+    }, end
+
+
+def iter_segment(path):
+    """Yield (offset, record) for every complete record of a segment"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= len(SEGMENT_MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if buffer[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+                raise ValueError(f"{path} is not an audit segment")
+            offset = len(SEGMENT_MAGIC)
+            while True:
+                record, next_offset = decode_record(buffer, offset)
+                if record is None:
+                    return
+                yield offset, record
+                offset = next_offset
+
+
+def write_index(segment, entries):
+    """Write the sidecar index of a segment from (key, timestamp, offset) entries"""
+    entries.sort()
+    timestamps = [timestamp for _, timestamp, _ in entries]
+    path = index_path(segment)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(entries),
+                                  min(timestamps, default=0.0), max(timestamps, default=0.0)))
+        for entry in entries:
+            f.write(INDEX_ENTRY.pack(*entry))
+    os.replace(temporary, path)  # An index is either complete or absent
+    return path
+
+
+def build_index(segment):
+    """(Re)build the index of a segment by scanning it; returns the record count"""
+    entries = [(charger_key(record['charger_id']), record['timestamp'], offset)
+               for offset, record in iter_segment(segment)]
+    write_index(segment, entries)
+    return len(entries)
+
+
+class AuditLog:
+    """Rotating binary audit log written by a background thread"""
+
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, max_segments=0, max_queued=100000):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.records = 0
+        self.bytes_written = 0
+        self.segments_sealed = 0
+        self.errors = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread = threading.Thread(target=self._run, name='ocpp-audit', daemon=True)
+        self._file = None
+        self._segment = None
+        self._offset = 0
+        self._entries = []
+        self._sequence = 0
+
+    def start(self):
+        """Start the writer thread (new records go to a new segment after the existing ones)"""
+        os.makedirs(self.directory, exist_ok=True)
+        segments = list_segments(self.directory)
+        if segments:
+            self._sequence = int(SEGMENT_PATTERN.search(segments[-1]).group(1))
+        self._thread.start()
+
+    def record(self, charger_id, direction, action, frame):
+        """Queue one frame; cheap enough to call from the event loop for every message (never blocks)"""
+        try:
+            self._queue.put_nowait((time.time(), charger_id, direction, action, frame))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1:
+                logger.warning(f"Audit: writer cannot keep up ({self._queue.maxsize} records queued), dropping records")
+
+    def close(self):
+        """Write everything still queued, seal the current segment and stop the thread"""
+        self._queue.put(None)  # Blocks only until the writer has made room
+        self._thread.join()
+
+    def stats(self):
+        """Counters for --stats-file"""
+        return {
+            'directory': self.directory,
+            'records': self.records,
+            'bytes_written': self.bytes_written,
+            'segments_sealed': self.segments_sealed,
+            'errors': self.errors,
+            'dropped': self.dropped,
+            'queued': self._queue.qsize(),
+        }
+
+    # ==================== Writer thread ====================
+
+    def _run(self):
+        self._seal_leftovers()
+        while True:
+            item = self._queue.get()
+            # Drain whatever queued up meanwhile so bursts become one buffered write
+            while item is not None:
+                try:
+                    self._write(*item)
+                except OSError as e:
+                    # Keep draining (and dropping) rather than letting the queue grow without bound
+                    self.errors += 1
+                    if self.errors == 1:
+                        logger.error(f"Audit: write failed, dropping records: {e}")
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if self._file:
+                self._file.flush()
+            if item is None:
+                self._seal()
+                return
+
+    def _seal_leftovers(self):
+        """Index segments left unsealed by a previous run that did not shut down cleanly"""
+        for segment in list_segments(self.directory):
+            if not os.path.exists(index_path(segment)):
+                try:
+                    count = build_index(segment)
+                    logger.info(f"Audit: indexed unsealed segment {segment} ({count} records)")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Audit: cannot index {segment}: {e}")
+
+    def _write(self, timestamp, charger_id, direction, action, frame):
+        if self._file is None or self._offset >= self.segment_size:
+            self._rotate()
+        data = encode_record(timestamp, charger_id, direction, action, frame)
+        self._file.write(data)
+        self._entries.append((charger_key(charger_id), timestamp, self._offset))
+        self._offset += len(data)
+        self.records += 1
+        self.bytes_written += len(data)
+
+    def _rotate(self):
+        self._seal()
+        self._sequence += 1
+        self._segment = segment_path(self.directory, self._sequence)
+        self._file = open(self._segment, 'wb', buffering=1024 * 1024)
+        self._file.write(SEGMENT_MAGIC)
+        self._offset = len(SEGMENT_MAGIC)
+        self._entries = []
+
+    def _seal(self):
+        if self._file is None:
+            return
+        self._file.close()
+        write_index(self._segment, self._entries)
+        self.segments_sealed += 1
+        self._file = None
+        self._entries = []
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        if not self.max_segments:
+            return
+        segments = list_segments(self.directory)
+        for segment in segments[:max(0, len(segments) - self.max_segments)]:
+            for path in (segment, index_path(segment)):
+                if os.path.exists(path):
+                    os.remove(path)
+            logger.info(f"Audit: removed old segment {segment}")
+
+
+# ==================== Queries ====================
+
+def read_index_header(segment):
+    """(record count, first timestamp, last timestamp) of a sealed segment, or None if unindexed"""
+    path = index_path(segment)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        magic, count, first, last = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+    if magic != INDEX_MAGIC:
+        raise ValueError(f"{path} is not an audit index")
+    return count, first, last
+
+
+def _lower_bound(index, count, key, since):
+    """First index entry >= (key, since)"""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        entry_key, timestamp, _ = INDEX_ENTRY.unpack_from(index, INDEX_HEADER.size + middle * INDEX_ENTRY.size)
+        if (entry_key, timestamp) < (key, since):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _query_indexed(segment, key, charger_id, since, until):
+    with open(index_path(segment), 'rb') as index_file, open(segment, 'rb') as segment_file:
+        if os.fstat(index_file.fileno()).st_size <= INDEX_HEADER.size:
+            return
+        with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index, \
+                mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            _, count, _, _ = INDEX_HEADER.unpack_from(index, 0)
+            position = _lower_bound(index, count, key, since)
+            while position < count:
+                entry_key, timestamp, offset = INDEX_ENTRY.unpack_from(
+                    index, INDEX_HEADER.size + position * INDEX_ENTRY.size)
+                if entry_key != key or timestamp > until:
+                    return
+                record, _ = decode_record(buffer, offset)
+                if record is not None and record['charger_id'] == charger_id:  # Guard against key collisions
+                    yield record
+                position += 1
+
+
+def query(directory, charger_id=None, since=None, until=None):
+    """Yield records (oldest first per segment) for one charger and/or a time range.
+
+    With charger_id, sealed segments are searched through their index;
+    unsealed segments and charger-less queries scan the segments that
+    overlap the time range.
+    """
+    since = since if since is not None else float('-inf')
+    until = until if until is not None else float('inf')
+    key = charger_key(charger_id) if charger_id is not None else None
+    for segment in list_segments(directory):
+        header = read_index_header(segment)
+        if header is not None:
+            count, first, last = header
+            if not count or last < since or first > until:
+                continue
+            if key is not None:
+                yield from _query_indexed(segment, key, charger_id, since, until)
+                continue
+        for _, record in iter_segment(segment):
+            if since <= record['timestamp'] <= until and (charger_id is None or record['charger_id'] == charger_id):
+                yield record
@@ -0,0 +1,214 @@
+"""
+OCPP Tools Bandwidth Accounting
+-------------------------------
+permessage-deflate settings and per-connection byte counters shared by
+ocpp-simulator.py and mock-ocpp-server.py.
+
+Compression (--compression):
+    deflate  permessage-deflate (default, as websockets negotiates it),
+             tunable with --deflate-window-bits, --deflate-level and
+             --deflate-no-context-takeover
+    off      no compression
+
+Counters (per connection):
+    bytes_in / bytes_out          WebSocket bytes on the wire (frames, after
+                                  compression; the HTTP upgrade is included,
+                                  TLS record overhead is not)
+    payload_in / payload_out      OCPP message bytes before compression
+    compression ratio             bytes / payload (1.0 = no saving)
+"""
+
+import websockets
+from websockets.extensions.permessage_deflate import (
+    ClientPerMessageDeflateFactory,
+    ServerPerMessageDeflateFactory,
+)
+
+# websockets.connect()/serve() are the asyncio implementation (which takes
+# create_connection) from 14.0 on; 13.x ships websockets.asyncio, but the
+# top-level functions are still the legacy ones. Older: no byte counters.
+if int(websockets.__version__.split('.')[0]) >= 14:
+    from websockets.asyncio.client import ClientConnection
+    from websockets.asyncio.server import ServerConnection
+else:
+    ClientConnection = ServerConnection = None
+
+COMPRESSION_MODES = ('deflate', 'off')
+
+
+def add_compression_arguments(parser):
+    """Add the --compression / --deflate-* options to an ArgumentParser"""
+    parser.add_argument('--compression', choices=COMPRESSION_MODES, default='deflate',
+                        help='WebSocket compression (permessage-deflate or off)')
+    parser.add_argument('--deflate-window-bits', type=int, choices=range(9, 16), metavar='9-15',
+                        help='Max LZ77 window bits for both directions (default: websockets default)')
+    parser.add_argument('--deflate-level', type=int, choices=range(0, 10), metavar='0-9',
+                        help='zlib compression level (default: zlib default, 6)')
+    parser.add_argument('--deflate-no-context-takeover', action='store_true',
+                        help='Reset the compression context per message (less memory per connection, worse ratio)')
+
+
+def describe_compression(args):
+    """One-line description of the compression settings for banners"""
+    if args.compression == 'off':
+        return 'off'
+    settings = [f"window_bits={args.deflate_window_bits or 'default'}",
+                f"level={args.deflate_level if args.deflate_level is not None else 'default'}"]
+    if args.deflate_no_context_takeover:
+        settings.append('no_context_takeover')
+    return f"permessage-deflate ({', '.join(settings)})"
+
+
+def compress_settings(args):
+    """zlib settings (the window size is negotiated separately)"""
+    settings = {'memLevel': 5}  # Same as the websockets default
+    if args.deflate_level is not None:
+        settings['level'] = args.deflate_level
+    return settings
+
+
+def client_connect_options(args):
+    """Keyword arguments for websockets.connect()"""
+    options = {}
+    if ClientConnection is not None:
+        options['create_connection'] = MeteredClientConnection
+    if args.compression == 'off':
+        options['compression'] = None
+    elif args.deflate_window_bits or args.deflate_level is not None or args.deflate_no_context_takeover:
+        options['compression'] = None
+        options['extensions'] = [ClientPerMessageDeflateFactory(
+            server_no_context_takeover=args.deflate_no_context_takeover,
+            client_no_context_takeover=args.deflate_no_context_takeover,
+            server_max_window_bits=args.deflate_window_bits,
+            client_max_window_bits=args.deflate_window_bits or True,
+            compress_settings=compress_settings(args),
+        )]
+    return options
+
+
+def server_serve_options(args):
+    """Keyword arguments for websockets.serve()"""
+    options = {}
+    if ServerConnection is not None:
+        options['create_connection'] = MeteredServerConnection
+    if args.compression == 'off':
+        options['compression'] = None
+    elif args.deflate_window_bits or args.deflate_level is not None or args.deflate_no_context_takeover:
+        window_bits = args.deflate_window_bits or 12  # websockets default for servers
+        options['compression'] = None
+        options['extensions'] = [ServerPerMessageDeflateFactory(
+            server_no_context_takeover=args.deflate_no_context_takeover,
+            client_no_context_takeover=args.deflate_no_context_takeover,
+            server_max_window_bits=window_bits,
+            client_max_window_bits=window_bits,
+            compress_settings=compress_settings(args),
+        )]
+    return options
+
+
+def message_size(message):
+    """Size of a WebSocket message in bytes (str.isascii() is O(1) for OCPP's ASCII JSON)"""
+    if isinstance(message, str) and not message.isascii():
+        return len(message.encode())
+    return len(message)
+
+
+def format_counters(counters):
+    """Human-readable byte counters for log lines"""
+    def ratio(value):
+        return f"{value:.2f}" if value is not None else "-"
+    return (f"in {counters['bytes_in']} B (payload {counters['payload_in']} B, ratio {ratio(counters['ratio_in'])}), "
+            f"out {counters['bytes_out']} B (payload {counters['payload_out']} B, ratio {ratio(counters['ratio_out'])})")
+
+
+def compression_ratio(wire_bytes, payload_bytes):
+    """Wire bytes per payload byte (None until something was sent)"""
+    return round(wire_bytes / payload_bytes, 4) if payload_bytes else None
+
+
+class ByteCounters:
+    """Wire and payload byte counters; mixed into the websockets connection classes"""
+
+    bytes_in = 0
+    bytes_out = 0
+    payload_in = 0
+    payload_out = 0
+
+    def data_received(self, data):
+        self.bytes_in += len(data)
+        super().data_received(data)
+
+    def send_data(self):
+        # protocol.writes holds the frames the protocol is about to hand to the transport
+        self.bytes_out += sum(len(data) for data in self.protocol.writes)
+        super().send_data()
+
+    async def recv(self, *args, **kwargs):
+        message = await super().recv(*args, **kwargs)
+        self.payload_in += message_size(message)
+        return message
+
+    async def send(self, message, *args, **kwargs):
+        if isinstance(message, (str, bytes)):
+            self.payload_out += message_size(message)
+        await super().send(message, *args, **kwargs)
+
+    def counters(self):
+        """Byte counters and compression ratios of this connection"""
+        return {
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'payload_in': self.payload_in,
+            'payload_out': self.payload_out,
+            'ratio_in': compression_ratio(self.bytes_in, self.payload_in),
+            'ratio_out': compression_ratio(self.bytes_out, self.payload_out),
+        }
+
+
+class BandwidthTotals:
+    """Sums ByteCounters over many (or repeated) connections"""
+
+    def __init__(self):
+        self.connections = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.payload_in = 0
+        self.payload_out = 0
+
+    def add(self, connection):
+        """Add the counters of a finished connection (ignored if it has none)"""
+        if not isinstance(connection, ByteCounters):
+            return
+        self.connections += 1
+        self.bytes_in += connection.bytes_in
+        self.bytes_out += connection.bytes_out
+        self.payload_in += connection.payload_in
+        self.payload_out += connection.payload_out
+
+    def merge(self, other):
+        """Add another BandwidthTotals"""
+        self.connections += other.connections
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+        self.payload_in += other.payload_in
+        self.payload_out += other.payload_out
+
+    def summary(self):
+        """Totals and compression ratios as a dict (same keys as ByteCounters.counters)"""
+        return {
+            'connections': self.connections,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'payload_in': self.payload_in,
+            'payload_out': self.payload_out,
+            'ratio_in': compression_ratio(self.bytes_in, self.payload_in),
+            'ratio_out': compression_ratio(self.bytes_out, self.payload_out),
+        }
+
+
+if ClientConnection is not None:
+    class MeteredClientConnection(ByteCounters, ClientConnection):
+        """websockets client connection with byte counters"""
+
+    class MeteredServerConnection(ByteCounters, ServerConnection):
+        """websockets server connection with byte counters"""
@@ -0,0 +1,253 @@
+"""
+OCPP Tools Profiling Hooks
+--------------------------
+Shared --profile support for ocpp-simulator.py and mock-ocpp-server.py.
+
+Modes:
+    cprofile     cProfile over the whole process (.prof, open with snakeviz or
+                 pstats) plus a text report of the top functions
+    yappi        yappi CPU profile with asyncio-aware timing, attributed per
+                 OCPP action (pip install yappi)
+    tracemalloc  Allocation snapshots (.tracemalloc) and the top allocation
+                 sites compared with the start of the run
+
+Every mode also records:
+    - Per-action handler/call counts and wall time; CPU time only for
+      actions that run without awaiting (otherwise see the yappi per-action
+      report, which attributes CPU through the action tags)
+    - Event-loop lag samples (how late a periodic timer fires)
+
+Results are written to --profile-dir on exit and whenever the process gets
+SIGUSR1 (kill -USR1 <pid>), so a long run can be inspected while it is running.
+"""
+
+import asyncio
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import signal
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'yappi', 'tracemalloc')
+
+# OCPP action being handled (or called) by the current task
+current_action = contextvars.ContextVar('current_action', default=None)
+
+
+def lag_percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Profiler:
+    """Collects the profile selected with --profile and writes it to disk"""
+
+    def __init__(self, mode, output_dir, name, lag_interval=0.1, top=40, max_lag_samples=100000):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode} (expected one of {', '.join(PROFILE_MODES)})")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.prefix = f"{name}-{os.getpid()}"
+        self.lag_interval = lag_interval
+        self.top = top
+        self.lag_samples = deque(maxlen=max_lag_samples)  # (seconds since start, lag ms)
+        self.action_stats = defaultdict(lambda: [0, 0.0, 0.0, 0])  # action -> [count, wall s, cpu s, cpu count]
+        self.started = None
+        self.dumps = 0
+        self._profile = None
+        self._yappi = None
+        self._tags = {}
+        self._baseline_snapshot = None
+        self._lag_task = None
+
+    # ==================== Lifecycle ====================
+
+    def start(self):
+        """Start profiling; call from inside the running event loop"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.started = time.perf_counter()
+
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.mode == 'yappi':
+            try:
+                import yappi
+            except ImportError:
+                raise RuntimeError("--profile yappi requires yappi (pip install yappi)") from None
+            self._yappi = yappi
+            yappi.set_clock_type('cpu')
+            yappi.set_tag_callback(self._yappi_tag)
+            yappi.start()
+        else:
+            tracemalloc.start(25)
+            self._baseline_snapshot = tracemalloc.take_snapshot()
+
+        loop = asyncio.get_running_loop()
+        self._lag_task = loop.create_task(self._sample_loop_lag())
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, self.dump, 'signal')
+        except (NotImplementedError, AttributeError):  # Windows
+            pass
+        logger.info(f"Profiling ({self.mode}) - results in {self.output_dir}/{self.prefix}-*"
+                    + (" (kill -USR1 to write them now)" if hasattr(signal, 'SIGUSR1') else ""))
+
+    def stop(self):
+        """Stop profiling and write the final results"""
+        if self._lag_task:
+            self._lag_task.cancel()
+        paths = self.dump('exit')
+        if self._profile:
+            self._profile.disable()
+        elif self._yappi:
+            self._yappi.stop()
+        elif tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return paths
+
+    # ==================== Attribution ====================
+
+    @contextmanager
+    def action(self, name, awaits=False):
+        """Attribute the enclosed work to an OCPP action.
+
+        Pass awaits=True for a block that awaits: its process CPU time would
+        include whatever else the loop ran meanwhile, so only wall time is
+        recorded (yappi still attributes its CPU through the action tag).
+        """
+        token = current_action.set(name)
+        wall_started = time.perf_counter()
+        cpu_started = None if awaits else time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.action_stats[name]
+            stats[0] += 1
+            stats[1] += time.perf_counter() - wall_started
+            if cpu_started is not None:
+                stats[2] += time.process_time() - cpu_started
+                stats[3] += 1
+            current_action.reset(token)
+
+    def _yappi_tag(self):
+        """yappi tag callback: one tag per OCPP action (0 = outside any action)"""
+        action = current_action.get()
+        if action is None:
+            return 0
+        tag = self._tags.get(action)
+        if tag is None:
+            tag = self._tags[action] = len(self._tags) + 1
+        return tag
+
+    async def _sample_loop_lag(self):
+        """Measure how late a periodic timer fires - a busy loop delays every charger"""
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            lag_ms = max(0.0, (loop.time() - scheduled) * 1000)
+            self.lag_samples.append((round(time.perf_counter() - self.started, 3), round(lag_ms, 3)))
+
+    # ==================== Output ====================
+
+    def dump(self, reason='signal'):
+        """Write the current results; returns the written paths"""
+        self.dumps += 1
+        base = os.path.join(self.output_dir, f"{self.prefix}-{self.dumps:03d}")
+        paths = [self._write_summary(base + '-summary.json', reason)]
+        try:
+            if self._profile:
+                paths += self._write_cprofile(base)
+            elif self._yappi:
+                paths += self._write_yappi(base)
+            elif tracemalloc.is_tracing():
+                paths += self._write_tracemalloc(base)
+        except Exception as e:
+            logger.error(f"Failed to write {self.mode} profile: {e}")
+        logger.info(f"Profile written ({reason}): {', '.join(paths)}")
+        return paths
+
+    def summary(self):
+        """Per-action timings and event-loop lag as a dict"""
+        lags = sorted(lag for _, lag in self.lag_samples)
+        return {
+            'mode': self.mode,
+            'elapsed_s': round(time.perf_counter() - self.started, 3),
+            'actions': {
+                action: {
+                    'count': count,
+                    'wall_s': round(wall, 6),
+                    'cpu_s': round(cpu, 6) if cpu_count else None,
+                    'wall_ms_avg': round(wall / count * 1000, 4) if count else None,
+                    'cpu_ms_avg': round(cpu / cpu_count * 1000, 4) if cpu_count else None,
+                }
+                for action, (count, wall, cpu, cpu_count) in sorted(self.action_stats.items())
+            },
+            'loop_lag_ms': {
+                'interval_ms': self.lag_interval * 1000,
+                'samples': len(lags),
+                'p50': lag_percentile(lags, 50),
+                'p99': lag_percentile(lags, 99),
+                'max': lags[-1] if lags else None,
+                'timeline': list(self.lag_samples),
+            },
+        }
+
+    def _write_summary(self, path, reason):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'reason': reason, **self.summary()}, f, indent=2)
+        return path
+
+    def _write_cprofile(self, base):
+        self._profile.disable()
+        try:
+            self._profile.dump_stats(base + '.prof')
+            report = io.StringIO()
+            pstats.Stats(self._profile, stream=report).sort_stats('cumulative').print_stats(self.top)
+        finally:
+            self._profile.enable()
+        with open(base + '-top.txt', 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+        return [base + '.prof', base + '-top.txt']
+
+    def _write_yappi(self, base):
+        yappi = self._yappi
+        yappi.get_func_stats().save(base + '.prof', type='pstat')
+        with open(base + '-actions.txt', 'w', encoding='utf-8') as f:
+            tags = [('(outside actions)', 0)] + sorted(self._tags.items(), key=lambda item: item[1])
+            for action, tag in tags:
+                stats = yappi.get_func_stats(filter={'tag': tag}).sort('ttot')
+                if stats.empty():
+                    continue
+                f.write(f"===== {action} =====\n")
+                for stat in list(stats)[:self.top]:
+                    f.write(f"{stat.ncall:>10} {stat.ttot * 1000:>12.3f} ms total {stat.tsub * 1000:>12.3f} ms self"
+                            f"  {stat.name} ({os.path.basename(stat.module)}:{stat.lineno})\n")
+                f.write("\n")
+        return [base + '.prof', base + '-actions.txt']
+
+    def _write_tracemalloc(self, base):
+        snapshot = tracemalloc.take_snapshot()
+        snapshot.dump(base + '.tracemalloc')
+        current, peak = tracemalloc.get_traced_memory()
+        with open(base + '-top.txt', 'w', encoding='utf-8') as f:
+            f.write(f"Traced memory: current {current / 1024:.1f} KB, peak {peak / 1024:.1f} KB\n\n")
+            f.write(f"Top {self.top} allocation sites (growth since start):\n")
+            for stat in snapshot.compare_to(self._baseline_snapshot, 'lineno')[:self.top]:
+                f.write(f"  {stat}\n")
+            f.write(f"\nTop {self.top} allocation sites (total):\n")
+            for stat in snapshot.statistics('lineno')[:self.top]:
+                f.write(f"  {stat}\n")
+        return [base + '.tracemalloc', base + '-top.txt']
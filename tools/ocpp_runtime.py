@@ -0,0 +1,87 @@
+"""
+OCPP Tools Runtime Helpers
+--------------------------
+Process and connection measurements, the client SSLContext setup, the
+loader for sibling tool scripts and the local port helpers shared by the
+tools in this directory.
+"""
+
+import importlib.util
+import os
+import socket
+import ssl
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_tool(filename, module_name):
+    """Import one of the sibling tool scripts (their file names are not valid module names)"""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(TOOLS_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15.0):
+    """Wait until the mock server accepts connections"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Mock server did not start listening on port {port} within {timeout}s")
+
+
+def resource_usage():
+    """Return (CPU seconds, peak RSS in KB) of this process, or (None, None) if unavailable"""
+    if resource is None:
+        return None, None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and KB elsewhere
+    peak_rss_kb = usage.ru_maxrss / 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    return usage.ru_utime + usage.ru_stime, peak_rss_kb
+
+
+class TimedSSLObject(ssl.SSLObject):
+    """SSLObject that records how long its TLS handshake took"""
+
+    handshake_started = None
+    handshake_time = None
+
+    def do_handshake(self):
+        if self.handshake_started is None:
+            self.handshake_started = time.perf_counter()
+        super().do_handshake()
+        self.handshake_time = time.perf_counter() - self.handshake_started
+
+
+def build_ssl_context(ca_cert=None, client_cert=None, client_key=None, insecure=False,
+                      context_class=ssl.SSLContext):
+    """Create the client SSLContext used for wss:// URLs (handshakes are timed)"""
+    context = context_class(ssl.PROTOCOL_TLS_CLIENT)
+    context.sslobject_class = TimedSSLObject
+    if ca_cert:
+        context.load_verify_locations(ca_cert)
+    else:
+        context.load_default_certs()
+    if client_cert:
+        context.load_cert_chain(client_cert, client_key)
+    if insecure:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
@@ -1,12 +1,33 @@
 """
 Quick WebSocket Test for OCPP Backend
 Tests different WebSocket configurations to find what works
+
+Usage:
+    python test-ocpp-connection.py
+    python test-ocpp-connection.py --url wss://csms.example.com/ocpp/CHARGER-001 --ca-cert ca.pem
+
+Probe mode (continuous latency monitor):
+    python test-ocpp-connection.py --probe --connections 20 --interval 1 --duration 3600 \
+        --snapshot-interval 10 --snapshot-file probe.jsonl
+
+    Keeps N connections open (IDs <charger>-0001...), sends a Heartbeat on each
+    at a fixed schedule and records RTT percentiles, the mean difference of
+    consecutive RTTs (rtt_delta_ms), timeouts and reconnects. A JSON snapshot (window since the previous snapshot plus run
+    totals) is printed and appended to --snapshot-file every --snapshot-interval.
 """
 
+import argparse
 import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from datetime import datetime, timezone
 import websockets
+import websockets.exceptions
+from ocpp_runtime import build_ssl_context
 
-async def test_connection(url, subprotocols=None):
+async def test_connection(url, subprotocols=None, ssl_context=None):
     """Test WebSocket connection with different configurations"""
     print(f"\n{'='*60}")
     print(f"Testing: {url}")
@@ -14,47 +35,338 @@ async def test_connection(url, subprotocols=None):
         print(f"Subprotocols: {subprotocols}")
     print('='*60)
     
+    kwargs = {'ssl': ssl_context} if url.startswith('wss://') else {}
+    
     try:
         if subprotocols:
-            async with websockets.connect(url, subprotocols=subprotocols) as ws:
+            async with websockets.connect(url, subprotocols=subprotocols, **kwargs) as ws:
                 print(f"✓ Connected successfully!")
                 print(f"  Selected subprotocol: {ws.subprotocol}")
                 return True
         else:
-            async with websockets.connect(url) as ws:
+            async with websockets.connect(url, **kwargs) as ws:
                 print(f"✓ Connected successfully!")
                 return True
     except Exception as e:
         print(f"✗ Connection failed: {e}")
         return False
 
+# ==================== Probe Mode ====================
+
+def percentiles(histogram, pcts):
+    """Percentiles from a {bucket: count} histogram"""
+    total = sum(histogram.values())
+    if not total:
+        return {pct: 0.0 for pct in pcts}
+    results = {}
+    buckets = sorted(histogram.items())
+    for pct in pcts:
+        rank = max(1, round(pct / 100 * total))
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen >= rank:
+                results[pct] = bucket
+                break
+    return results
+
+
+class ProbeStats:
+    """Heartbeat RTT, RTT variation, timeout and reconnect counters.
+    
+    RTTs are kept in 0.1 ms histogram buckets, so memory stays constant
+    however long the probe runs. Counters exist both for the current
+    snapshot window and for the whole run.
+    """
+    
+    BUCKET_MS = 0.1
+    COUNTERS = ('sent', 'received', 'timeouts', 'errors', 'reconnects')
+    
+    def __init__(self):
+        self.started = time.monotonic()
+        self.open_connections = 0
+        self.total = self._new_window()
+        self.window = self._new_window()
+    
+    def _new_window(self):
+        window = dict.fromkeys(self.COUNTERS, 0)
+        window['rtt'] = Counter()
+        window['delta_sum'] = 0.0
+        window['delta_count'] = 0
+        return window
+    
+    def reset(self):
+        """Discard everything recorded so far (e.g. after a warmup period)"""
+        self.started = time.monotonic()
+        self.total = self._new_window()
+        self.window = self._new_window()
+    
+    def count(self, key):
+        self.window[key] += 1
+        self.total[key] += 1
+    
+    def record_rtt(self, rtt_ms, previous_rtt_ms=None):
+        bucket = round(rtt_ms / self.BUCKET_MS) * self.BUCKET_MS
+        for window in (self.window, self.total):
+            window['received'] += 1
+            window['rtt'][bucket] += 1
+            if previous_rtt_ms is not None:
+                # Mean absolute difference of consecutive RTTs on one connection
+                # (not the RFC 3550 smoothed estimator, which weights recent samples)
+                window['delta_sum'] += abs(rtt_ms - previous_rtt_ms)
+                window['delta_count'] += 1
+    
+    def _summarize(self, window):
+        rtt = window['rtt']
+        received = sum(rtt.values())
+        pcts = percentiles(rtt, (50, 90, 99))
+        summary = {key: window[key] for key in self.COUNTERS}
+        summary['rtt_ms'] = {
+            'p50': round(pcts[50], 1),
+            'p90': round(pcts[90], 1),
+            'p99': round(pcts[99], 1),
+            'max': round(max(rtt), 1) if rtt else 0.0,
+            'mean': round(sum(bucket * count for bucket, count in rtt.items()) / received, 2) if received else 0.0,
+        }
+        summary['rtt_delta_ms'] = round(window['delta_sum'] / window['delta_count'], 2) if window['delta_count'] else 0.0
+        summary['timeout_rate'] = round(window['timeouts'] / window['sent'], 4) if window['sent'] else 0.0
+        return summary
+    
+    def snapshot(self):
+        """Summarize and reset the current window"""
+        snapshot = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'elapsed_s': round(time.monotonic() - self.started, 1),
+            'connections_open': self.open_connections,
+            'window': self._summarize(self.window),
+            'total': self._summarize(self.total),
+        }
+        self.window = self._new_window()
+        return snapshot
+
+
+async def ocpp_call(ws, action, payload, message_ids, timeout, stats=None):
+    """Send an OCPP CALL and wait for its result; returns (rtt_ms, response).
+    
+    Frames that are not OCPP messages are skipped and counted as errors in stats.
+    """
+    message_id = str(next(message_ids))
+    started = time.perf_counter()
+    await ws.send(json.dumps([2, message_id, action, payload]))
+    
+    async def wait_for_response():
+        while True:
+            try:
+                message = json.loads(await ws.recv())
+                if not isinstance(message, list) or len(message) < 3:
+                    raise ValueError("not an OCPP message")
+            except ValueError:
+                if stats is not None:
+                    stats.count('errors')
+                continue
+            if message[0] in (3, 4) and message[1] == message_id:
+                return message
+            if message[0] == 2:
+                # Requests from the Central System are not supported by the probe
+                await ws.send(json.dumps([4, message[1], "NotImplemented", "", {}]))
+            # Anything else is a late response to a call that already timed out
+    
+    response = await asyncio.wait_for(wait_for_response(), timeout)
+    return (time.perf_counter() - started) * 1000, response
+
+
+async def probe_connection(url, stats, interval, deadline, offset=0.0, timeout=5.0,
+                           ssl_context=None, reconnect_delay=1.0):
+    """Keep one connection open and send Heartbeats on a fixed schedule until deadline"""
+    kwargs = {'ssl': ssl_context} if url.startswith('wss://') else {}
+    message_ids = itertools.count(1)
+    await asyncio.sleep(offset)
+    next_send = time.monotonic()
+    connected_before = False
+    
+    while next_send < deadline and time.monotonic() < deadline:
+        previous_rtt = None
+        
+        try:
+            async with websockets.connect(
+                url,
+                subprotocols=['ocpp1.6'],
+                ping_interval=None,
+                open_timeout=timeout,
+                close_timeout=timeout,
+                **kwargs
+            ) as ws:
+                # Only a connection that follows an established one is a reconnect
+                if connected_before:
+                    stats.count('reconnects')
+                connected_before = True
+                stats.open_connections += 1
+                try:
+                    await ocpp_call(ws, "BootNotification", {
+                        "chargePointVendor": "EV-CMS Probe",
+                        "chargePointModel": "Latency-Probe",
+                    }, message_ids, timeout, stats)
+                    
+                    while next_send < deadline:
+                        delay = next_send - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                        # Stay on the fixed grid; slots missed while waiting are skipped
+                        now = time.monotonic()
+                        if now >= deadline:
+                            break
+                        while next_send <= now:
+                            next_send += interval
+                        
+                        stats.count('sent')
+                        try:
+                            rtt, response = await ocpp_call(ws, "Heartbeat", {}, message_ids, timeout, stats)
+                        except asyncio.TimeoutError:
+                            stats.count('timeouts')
+                            previous_rtt = None
+                            continue
+                        
+                        if response[0] == 4:
+                            stats.count('errors')
+                        else:
+                            stats.record_rtt(rtt, previous_rtt)
+                            previous_rtt = rtt
+                finally:
+                    stats.open_connections -= 1
+        except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException):
+            stats.count('errors')
+        
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(min(reconnect_delay, remaining))
+
+
+def probe_urls(url, connections):
+    """One charger ID per connection: <url>-0001, <url>-0002, ... (the URL itself if only one)"""
+    if connections == 1:
+        return [url]
+    return [f"{url}-{i:04d}" for i in range(1, connections + 1)]
+
+
+async def run_probe(url, connections, interval, duration, timeout=5.0, ssl_context=None,
+                    snapshot_interval=None, on_snapshot=None, warmup=0.0):
+    """Run the Heartbeat probe and return the final snapshot.
+    
+    on_snapshot(snapshot) is called every snapshot_interval seconds and once at the end.
+    Run totals only count traffic after the first `warmup` seconds (connection ramp).
+    """
+    stats = ProbeStats()
+    deadline = time.monotonic() + duration
+    tasks = [
+        asyncio.ensure_future(probe_connection(
+            probe_url, stats, interval, deadline,
+            offset=interval * i / connections, timeout=timeout, ssl_context=ssl_context,
+        ))
+        for i, probe_url in enumerate(probe_urls(url, connections))
+    ]
+    
+    async def report_periodically():
+        while True:
+            await asyncio.sleep(snapshot_interval)
+            if on_snapshot:
+                on_snapshot(stats.snapshot())
+    
+    async def end_warmup():
+        await asyncio.sleep(warmup)
+        stats.reset()
+    
+    reporter = asyncio.ensure_future(report_periodically()) if snapshot_interval else None
+    warmup_task = asyncio.ensure_future(end_warmup()) if warmup else None
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks + [reporter, warmup_task]:
+            if task:
+                task.cancel()
+    
+    snapshot = stats.snapshot()
+    if on_snapshot:
+        on_snapshot(snapshot)
+    return snapshot
+
+
+def print_snapshot(snapshot, snapshot_file=None):
+    """Print a one-line snapshot summary and append the JSON snapshot to a file"""
+    window = snapshot['window']
+    rtt = window['rtt_ms']
+    print(f"[{snapshot['elapsed_s']:>7.1f}s] open={snapshot['connections_open']:<4} "
+          f"sent={window['sent']:<5} ok={window['received']:<5} timeouts={window['timeouts']:<3} "
+          f"reconnects={window['reconnects']:<3} p50={rtt['p50']:.1f} p90={rtt['p90']:.1f} "
+          f"p99={rtt['p99']:.1f} max={rtt['max']:.1f} Δrtt={window['rtt_delta_ms']:.2f} ms")
+    if snapshot_file:
+        with open(snapshot_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(snapshot) + '\n')
+
+
 async def main():
     """Test various configurations"""
+    parser = argparse.ArgumentParser(description='Quick OCPP WebSocket connection test')
+    parser.add_argument('--url', default='ws://localhost:8080/ocpp/CHARGER-001', help='Charger WebSocket URL')
+    parser.add_argument('--ca-cert', help='CA certificate (PEM) for wss://')
+    parser.add_argument('--client-cert', help='Client certificate (PEM) for wss://')
+    parser.add_argument('--client-key', help='Client private key (PEM) for wss://')
+    parser.add_argument('--insecure', action='store_true', help='Skip TLS certificate verification')
+    parser.add_argument('--probe', action='store_true', help='Run the continuous Heartbeat latency probe')
+    parser.add_argument('--connections', type=int, default=1, help='Probe: connections to keep open')
+    parser.add_argument('--interval', type=float, default=1.0, help='Probe: seconds between Heartbeats per connection')
+    parser.add_argument('--duration', type=float, default=60.0, help='Probe: run time in seconds')
+    parser.add_argument('--timeout', type=float, default=5.0, help='Probe: Heartbeat response timeout in seconds')
+    parser.add_argument('--snapshot-interval', type=float, default=10.0, help='Probe: seconds between snapshots')
+    parser.add_argument('--snapshot-file', help='Probe: append JSON snapshots to this file')
+    args = parser.parse_args()
+    
+    url = args.url
+    ssl_context = None
+    if url.startswith('wss://'):
+        ssl_context = build_ssl_context(args.ca_cert, args.client_cert, args.client_key, args.insecure)
+    
+    if args.probe:
+        print("\n" + "="*60)
+        print(f"OCPP Latency Probe: {args.connections} connections, Heartbeat every {args.interval}s "
+              f"for {args.duration}s")
+        print("="*60)
+        final = await run_probe(
+            url, args.connections, args.interval, args.duration, args.timeout, ssl_context,
+            args.snapshot_interval, lambda snapshot: print_snapshot(snapshot, args.snapshot_file),
+        )
+        total = final['total']
+        print("\n" + "="*60)
+        print(f"Total: sent={total['sent']} ok={total['received']} timeouts={total['timeouts']} "
+              f"errors={total['errors']} reconnects={total['reconnects']}")
+        print(f"RTT ms: p50={total['rtt_ms']['p50']} p90={total['rtt_ms']['p90']} "
+              f"p99={total['rtt_ms']['p99']} max={total['rtt_ms']['max']} Δrtt={total['rtt_delta_ms']}")
+        print("="*60)
+        return
     
     tests = [
         # Test 1: Standard ocpp1.6
         {
-            'url': 'ws://localhost:8080/ocpp/CHARGER-001',
+            'url': url,
             'subprotocols': ['ocpp1.6']
         },
         # Test 2: Alternative ocpp16
         {
-            'url': 'ws://localhost:8080/ocpp/CHARGER-001',
+            'url': url,
             'subprotocols': ['ocpp16']
         },
         # Test 3: No subprotocol
         {
-            'url': 'ws://localhost:8080/ocpp/CHARGER-001',
+            'url': url,
             'subprotocols': None
         },
         # Test 4: Multiple subprotocols
         {
-            'url': 'ws://localhost:8080/ocpp/CHARGER-001',
+            'url': url,
             'subprotocols': ['ocpp1.6', 'ocpp16', 'ocpp']
         },
         # Test 5: Just 'ocpp'
         {
-            'url': 'ws://localhost:8080/ocpp/CHARGER-001',
+            'url': url,
             'subprotocols': ['ocpp']
         },
     ]
@@ -65,7 +377,7 @@ async def main():
     
     for i, test in enumerate(tests, 1):
         print(f"\nTest {i}:")
-        await test_connection(test['url'], test.get('subprotocols'))
+        await test_connection(test['url'], test.get('subprotocols'), ssl_context)
         await asyncio.sleep(0.5)
     
     print("\n" + "="*60)